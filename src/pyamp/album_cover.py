@@ -13,13 +13,15 @@
 #
 #    You should have received a copy of the GNU General Public License
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
-import io
 import os
-from mutagen import File
-from PIL import Image, ImageQt
 from PySide6.QtWidgets import QLabel, QMainWindow, QVBoxLayout, QWidget
 from PySide6.QtGui import QPixmap
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QThread
+from pyamp.art_cache import NO_ART, art_key, get_art_cache
+from pyamp.art_resolver import ArtResolver
+from pyamp.art_sources import ArtPipeline
+from pyamp.config import get_config
+from pyamp.cover_index import CoverCrawler, get_cover_index
 
 class AlbumCoverWindow(QMainWindow):
     '''Window containing the current song's cover'''
@@ -40,94 +42,76 @@ class AlbumCoverWindow(QMainWindow):
         central_widget.setLayout(self.layout)
         self.layout.setContentsMargins(0, 0, 0, 0)  # Remove any margins
 
-        # Get the MPD client
-        self.client = mpd_manager.get_client()
+        self.mpd_manager = mpd_manager
 
-        # Connect the songChanged signal to the update_album_art slot
-        main_window.songChanged.connect(self.update_album_art)
+        # Songs of the same album share the cached art
+        self.art_cache = get_art_cache()
+        self.current_key = None
+        self.shown_art = None
 
-    def join_path(self):
-        '''Return the current song's full path'''
-        song_uri = self.client.currentsong().get("file")
+        # Art is resolved on a pool of threads with their own connections, apart from the transport commands
+        # The sources, and their order, come from the config
+        self.art_pipeline = ArtPipeline(
+            mpd_manager.connection, get_config().art_sources, self.art_cache.width
+        )
+        self.art_resolver = ArtResolver(mpd_manager.connection, self.art_cache, self.art_pipeline)
+        self.art_resolver.artReady.connect(self.album_art_found)
+        self.prefetched_id = None
+
+        # Optionally find the cover of every directory before it's needed
+        self.cover_crawler = None
         music_dir = os.environ.get("MUSIC_DIR")
+        if music_dir and get_config().crawl_covers:
+            self.cover_crawler = CoverCrawler(get_cover_index(), music_dir)
+            self.cover_crawler.setPriority(QThread.LowestPriority)
+            self.cover_crawler.start()
+
+        # Connect the songChanged signal to the update_album_art slot
+        main_window.songChanged.connect(self.update_album_art)
+        # The next song's art is fetched while the current one plays
+        mpd_manager.status_watcher.statusChanged.connect(self.prefetch_next)
+
+    def shutdown(self):
+        '''Stop resolving album art and save the cover index'''
+        if self.cover_crawler:
+            self.cover_crawler.stop()
+        self.art_resolver.close()
+        get_cover_index().save()
+
+    def update_album_art(self, current_song):
+        '''Show the album art for the current song, resolving it in the background on a cache miss'''
+        key = art_key(current_song)
+        self.current_key = key
+        pixmap = self.art_cache.get(key)
+        if pixmap is not None:
+            self.album_art_found(key, pixmap)
+        else:
+            self.art_resolver.request(current_song)
+
+    def prefetch_next(self, status):
+        '''Resolve the art of the next song in the queue before it starts playing'''
+        next_id = status.get("nextsongid")
+        if next_id and next_id != self.prefetched_id:
+            self.prefetched_id = next_id
+            self.art_resolver.prefetch(next_id)
+
+    def album_art_found(self, key, album_art):
+        '''Cache the resolved art and show it if its song is the current one'''
+        if album_art is not NO_ART and not isinstance(album_art, QPixmap):
+            # Pixmaps can only be created on the GUI thread
+            album_art = QPixmap.fromImage(album_art) if album_art else NO_ART
+            self.art_cache.put(key, album_art)
+
+        # Prefetched art, art of a song skipped while it was resolved, or art already shown
+        if key != self.current_key or album_art is self.shown_art:
+            return
+        self.shown_art = album_art
 
-        if song_uri and music_dir:
-            absolute_song_path = os.path.join(music_dir, song_uri)
-
-            # Check if the path contains '.cue'; If yes, strip the cue part to get the base directory
-            # MPD Bug (or feature) that causes some songs uri to be what's in the cue sheet. ):
-            if '.cue' in absolute_song_path.lower():
-                # Strip the file name (which is the cue file) and get the parent directory
-                song_dir = os.path.dirname(absolute_song_path)
-                base_dir = os.path.dirname(song_dir)  # Get the parent directory of the cue file
-                return base_dir + '/'  # Ensure trailing slash is appended (:
-            return absolute_song_path
-        return None
-
-    def album_art_from_mpd(self, current_song):
-        '''Return the art for the current song using mpd as a QPixmap'''
-        try:
-            album_art_data = self.client.albumart(current_song.get("file"))
-
-            # Check if album art is returned in binary format or dict with binary key
-            if isinstance(album_art_data, (bytes, dict)) and (
-                isinstance(album_art_data, dict) and 'binary' in album_art_data or isinstance(album_art_data, bytes)
-            ):
-                binary_data = album_art_data['binary'] if isinstance(album_art_data, dict) else album_art_data
-                pil_image = Image.open(io.BytesIO(binary_data))
-                return QPixmap.fromImage(ImageQt.ImageQt(pil_image))
-        except Exception:
-            pass
-        return None
-
-    def album_art_from_metadata(self, file):
-        '''Return the art for the current song using metadata as a QPixmap'''
-        if file and os.path.isfile(file):
-            try:
-                audio = File(file)
-                if 'covr' in audio.tags:
-                    image_data = audio.tags['covr'][0]
-                    pil_image = Image.open(io.BytesIO(image_data))
-                    return QPixmap.fromImage(ImageQt.ImageQt(pil_image))
-            except Exception:
-                pass
-        return None
-
-    def album_art_from_directory(self, directory):
-        '''Searches for image files in the specified directory'''
-        if directory:
-            image_extensions = ('.jpg', '.jpeg', '.png', '.gif')
-            for filename in os.listdir(directory):
-                if filename.lower().endswith(image_extensions):
-                    return os.path.join(directory, filename)
-        return None
-
-    def update_album_art(self):
-        '''Get the album art for the current song and call show_album_art on it'''
         # Clear the layout before adding new album art
         self.clear_layout(self.layout)
 
-        # Get current song info
-        current_song = self.client.currentsong()
-        # Try setting album art using MPD's native art feature
-        album_art = self.album_art_from_mpd(current_song)
-
-        # If MPD album art retrieval fails, fall back to file metadata
-        if not album_art:
-            absolute_song_path = self.join_path()
-            album_art = self.album_art_from_metadata(absolute_song_path) if absolute_song_path else None
-
-        # If both MPD and metadata fail, try finding an image in the song's directory
-        if not album_art:
-            song_dir = os.path.dirname(absolute_song_path) if absolute_song_path else None
-            if song_dir:
-                image_path = self.album_art_from_directory(song_dir)
-                if image_path:
-                    pil_image = Image.open(image_path)
-                    album_art = QPixmap.fromImage(ImageQt.ImageQt(pil_image))
-
         # If no album art was found (skill issue)
-        if not album_art:
+        if album_art is NO_ART:
             self.show_no_album_art_found()
         else:
             self.show_album_art(album_art)
@@ -146,7 +130,8 @@ class AlbumCoverWindow(QMainWindow):
     def show_album_art(self, album_art):
         '''Set the background of the parent layout as the given image (QPixmap)'''
         label = QLabel()
-        label.setPixmap(album_art.scaledToWidth(300, mode=Qt.SmoothTransformation))
+        # Already scaled to the window's width by the art cache
+        label.setPixmap(album_art)
         label.setScaledContents(True)
         self.layout.addWidget(label)
 
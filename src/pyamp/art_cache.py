@@ -0,0 +1,136 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import hashlib
+import posixpath
+from collections import OrderedDict
+from PySide6.QtGui import QImage
+from PySide6.QtCore import Qt
+
+# Stored for albums without art, so they aren't looked up again
+NO_ART = object()
+
+
+def art_key(song):
+    '''Return the key shared by every song with the same cover'''
+    album = song.get("album")
+    if isinstance(album, list):
+        album = album[0]
+    if album:
+        artist = song.get("albumartist") or song.get("artist") or ""
+        if isinstance(artist, list):
+            artist = artist[0]
+        return f"album:{artist}\n{album}"
+    # Untagged songs share the cover of their directory
+    return "dir:" + posixpath.dirname(song.get("file", ""))
+
+
+class ArtCache:
+    '''Two level cache of scaled album art: pixmaps in memory, thumbnails on disk'''
+    def __init__(self, width=300, max_pixmaps=32, cache_dir="~/.cache/pyamp/art", max_disk_bytes=64 * 1024 * 1024):
+        self.width = width
+        self.max_pixmaps = max_pixmaps
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_disk_bytes = max_disk_bytes
+        # Most recently used last, only touched from the GUI thread
+        self.pixmaps = OrderedDict()
+
+    def get(self, key):
+        '''Return the cached pixmap for the key, NO_ART or None on a miss'''
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        '''Store a pixmap, or NO_ART, evicting the least recently used ones'''
+        self.pixmaps[key] = pixmap
+        self.pixmaps.move_to_end(key)
+        while len(self.pixmaps) > self.max_pixmaps:
+            self.pixmaps.popitem(last=False)
+
+    def scale(self, image):
+        '''Scale an image to the width shown by the album art window'''
+        if image.width() == self.width:
+            return image
+        return image.scaledToWidth(self.width, Qt.SmoothTransformation)
+
+    def thumbnail_path(self, key):
+        '''Return the path of the thumbnail stored for the key'''
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".png")
+
+    def load_thumbnail(self, key):
+        '''Return the stored thumbnail for the key as a QImage, None if there is none'''
+        path = self.thumbnail_path(key)
+        image = QImage(path)
+        if image.isNull():
+            return None
+        try:
+            # The modification time orders thumbnails for eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return image
+
+    def save_thumbnail(self, key, image):
+        '''Store a scaled image on disk, then evict the oldest thumbnails past the size cap'''
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            print("An error occurred while caching album art: ", e)
+            return
+        path = self.thumbnail_path(key)
+        try:
+            if not image.save(path + ".tmp", "PNG"):
+                raise OSError(f"can't write {path}.tmp")
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            # The art is still shown, it's resolved again next time
+            print("An error occurred while caching album art: ", e)
+            try:
+                os.remove(path + ".tmp")
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    def evict(self):
+        '''Delete the least recently used thumbnails until the cache fits its size cap'''
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".png")]
+            stats = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries]
+        except OSError:
+            return
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+ART_CACHE = None
+
+
+def get_art_cache():
+    '''Return the process wide art cache'''
+    global ART_CACHE
+    if ART_CACHE is None:
+        ART_CACHE = ArtCache()
+    return ART_CACHE
@@ -0,0 +1,121 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QObject, Signal
+from pyamp.art_cache import art_key
+from pyamp.connection import CONNECTION_ERRORS
+
+
+class ArtResolver(QObject):
+    '''Resolve album art on a pool of threads, off the GUI thread and the MPD command worker'''
+    # Art key and scaled QImage, None if the song has no art
+    artReady = Signal(str, object)
+
+    def __init__(self, new_connection, art_cache, pipeline, workers=2):
+        super().__init__()
+        # Called with a name, returns a new MPDConnection
+        self.new_connection = new_connection
+        self.art_cache = art_cache
+        # Races the art sources for each song
+        self.pipeline = pipeline
+        # Large covers take a while to transfer, they must not hold up playback commands
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pyamp-art")
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        # Keys being resolved, a key is never resolved twice at once
+        self.pending = set()
+        self.closing = False
+
+    def connection(self):
+        '''Return the MPD connection of the calling pool thread, used to look up queued songs'''
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = self.new_connection("prefetch")
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def request(self, song):
+        '''Resolve the art of a song in the background, artReady is emitted with the result'''
+        key = art_key(song)
+        if self.claim(key):
+            self.executor.submit(self.run, key, song)
+
+    def prefetch(self, song_id):
+        '''Resolve the art of a queued song ahead of time'''
+        self.executor.submit(self.run_prefetch, song_id)
+
+    def claim(self, key):
+        '''Mark a key as being resolved, False if it already is'''
+        with self.lock:
+            if key in self.pending:
+                return False
+            self.pending.add(key)
+            return True
+
+    def run_prefetch(self, song_id):
+        '''Look up a queued song and resolve its art unless it's already cached'''
+        connection = self.connection()
+        for attempt in range(2):
+            try:
+                songs = connection.connect(retry=False).playlistid(song_id)
+                break
+            except CONNECTION_ERRORS as e:
+                # MPD closes connections left unused for its connection_timeout, try once more on a new one
+                connection.drop()
+                if attempt or self.closing:
+                    print("An error occurred while prefetching album art: ", e)
+                    return
+            except Exception as e:
+                print("An error occurred while prefetching album art: ", e)
+                return
+        if not songs:
+            return
+        key = art_key(songs[0])
+        # Only a membership test, the LRU order belongs to the GUI thread
+        if key not in self.art_cache.pixmaps and self.claim(key):
+            self.run(key, songs[0])
+
+    def run(self, key, song):
+        '''Load the art from the disk cache or resolve, scale and store it, then emit artReady'''
+        try:
+            # Thumbnails stored by previous runs skip the lookup and the scaling
+            image = self.art_cache.load_thumbnail(key)
+            if image is None:
+                image = self.pipeline.fetch(song)
+                if image:
+                    image = self.art_cache.scale(image)
+                    self.art_cache.save_thumbnail(key, image)
+        except Exception as e:
+            # Not cached as missing art, the next song change tries again
+            if not self.closing:
+                print("An error occurred while resolving album art: ", e)
+            return
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+        self.artReady.emit(key, image or None)
+
+    def close(self):
+        '''Drop queued work, interrupt the running resolutions and disconnect'''
+        self.closing = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pipeline.close()
+        self.executor.shutdown(wait=True)
+        for connection in self.connections:
+            connection.drop()
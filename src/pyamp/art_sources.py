@@ -0,0 +1,383 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import base64
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import monotonic, perf_counter
+from PySide6.QtGui import QImageReader
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QSize
+from mpd import CommandError
+from pyamp.connection import CONNECTION_ERRORS
+from pyamp.mpd_core import LatencyHistogram
+from pyamp.cover_index import get_cover_index
+
+# Picture type of front covers in ID3 and FLAC
+FRONT_COVER = 3
+
+
+def song_path(song):
+    '''Return the song's full path, None if MUSIC_DIR isn't set'''
+    song_uri = song.get("file")
+    music_dir = os.environ.get("MUSIC_DIR")
+
+    if song_uri and music_dir:
+        absolute_song_path = os.path.join(music_dir, song_uri)
+
+        # Check if the path contains '.cue'; If yes, strip the cue part to get the base directory
+        # MPD Bug (or feature) that causes some songs uri to be what's in the cue sheet. ):
+        if '.cue' in absolute_song_path.lower():
+            # Strip the file name (which is the cue file) and get the parent directory
+            song_dir = os.path.dirname(absolute_song_path)
+            base_dir = os.path.dirname(song_dir)  # Get the parent directory of the cue file
+            return base_dir + '/'  # Ensure trailing slash is appended (:
+        return absolute_song_path
+    return None
+
+
+def decode_image(data, width=None):
+    '''Decode image data to a QImage scaled to the given width, None if it isn't an image'''
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.ReadOnly)
+    reader = QImageReader(buffer)
+    # Covers tagged with an EXIF orientation show up the right way
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if width and size.isValid() and size.width() > 0:
+        # Scaling during the decode lets JPEG skip most of the work, the full size image never exists
+        reader.setScaledSize(QSize(width, max(1, round(size.height() * width / size.width()))))
+    image = reader.read()
+    return None if image.isNull() else image
+
+
+def front_cover(pictures):
+    '''Return the data of the front cover, or of the first picture if none is marked as such'''
+    for picture in pictures:
+        if picture.type == FRONT_COVER:
+            return picture.data
+    return pictures[0].data if pictures else None
+
+
+class ArtRequest:
+    '''A song whose art the sources race to find'''
+    def __init__(self, pipeline, song):
+        self.pipeline = pipeline
+        self.song = song
+        self.path = song_path(song)
+        self.lock = threading.Lock()
+        self.cancelled = False
+        # Sources that lost the race by timing out, their late results aren't counted
+        self.timed_out = set()
+        # Connections this request owns, a thread's connection goes to its next request once released
+        self.connections = []
+
+    def run(self, function, *args):
+        '''Call function(client, *args) on the calling thread's connection, interrupted if the request is cancelled'''
+        connection = self.pipeline.connection()
+        with self.lock:
+            self.connections.append(connection)
+        for attempt in range(2):
+            # No waiting for MPD to come back, MPD being down is a miss like any other
+            client = connection.connect(retry=False)
+            try:
+                return function(client, *args)
+            except CONNECTION_ERRORS:
+                # MPD closes connections left unused for its connection_timeout, the next song opens a new one
+                connection.drop()
+                if attempt or self.cancelled:
+                    raise
+        return None
+
+    def owns(self, connection):
+        '''Return whether the connection is still used by this request'''
+        with self.lock:
+            return connection in self.connections
+
+    def release(self, connection):
+        '''Give up a connection, return False if cancel() may have interrupted it'''
+        with self.lock:
+            self.connections.remove(connection)
+            return not self.cancelled
+
+    def cancel(self):
+        '''Interrupt the sources still transferring art from MPD'''
+        # Interrupted with the lock held, a connection can't be released and reused by the next request meanwhile
+        with self.lock:
+            self.cancelled = True
+            for connection in self.connections:
+                connection.interrupt()
+
+
+class ArtSource(ABC):
+    '''Where album art can be found, fetch() returns the image data or None'''
+    name = None
+    # Sources asking MPD, their connection errors mean the connection is lost
+    remote = False
+
+    def __init__(self, timeout):
+        # Seconds before the source loses the race
+        self.timeout = timeout
+
+    @abstractmethod
+    def fetch(self, request):
+        '''Return the image data for the request's song, None if there is none'''
+
+
+class AlbumArtSource(ArtSource):
+    '''Cover file MPD finds next to the song'''
+    name = "albumart"
+    remote = True
+
+    def __init__(self, timeout=5.0):
+        super().__init__(timeout)
+
+    def fetch(self, request):
+        '''Return the image data for the request's song, None if there is none'''
+        return request.run(lambda client, uri: client.albumart(uri), request.song.get("file")).get("binary")
+
+
+class ReadPictureSource(ArtSource):
+    '''Picture MPD reads from the song's tags'''
+    name = "readpicture"
+    remote = True
+
+    def __init__(self, timeout=5.0):
+        super().__init__(timeout)
+
+    def fetch(self, request):
+        '''Return the image data for the request's song, None if there is none'''
+        # An empty response means the song has no picture
+        return request.run(lambda client, uri: client.readpicture(uri), request.song.get("file")).get("binary")
+
+
+class EmbeddedArtSource(ArtSource):
+    '''Picture embedded in the song's file, read with mutagen, needs MUSIC_DIR'''
+    name = "embedded"
+
+    def __init__(self, timeout=2.0):
+        super().__init__(timeout)
+
+    def fetch(self, request):
+        '''Return the image data for the request's song, None if there is none'''
+        if not request.path or not os.path.isfile(request.path):
+            return None
+        # Imported on first use, most sessions find the art through MPD and never need it
+        from mutagen import File # pylint: disable=import-outside-toplevel
+        from mutagen.flac import Picture # pylint: disable=import-outside-toplevel
+        audio = File(request.path)
+        if audio is None:
+            return None
+        # FLAC picture blocks
+        if getattr(audio, "pictures", None):
+            return front_cover(audio.pictures)
+        tags = audio.tags
+        if not tags:
+            return None
+        # ID3 attached pictures
+        if hasattr(tags, "getall"):
+            return front_cover(tags.getall("APIC"))
+        # MP4 cover atoms
+        if "covr" in tags:
+            return bytes(tags["covr"][0])
+        # Vorbis comments hold FLAC picture blocks encoded in base64
+        if "metadata_block_picture" in tags:
+            return front_cover([Picture(base64.b64decode(data)) for data in tags["metadata_block_picture"]])
+        return None
+
+
+class DirectoryArtSource(ArtSource):
+    '''Cover file in the song's directory, needs MUSIC_DIR'''
+    name = "directory"
+
+    def __init__(self, timeout=1.0, index=None):
+        super().__init__(timeout)
+        # Picks the cover of each directory once, only a stat is needed until the directory changes
+        self.index = index or get_cover_index()
+
+    def fetch(self, request):
+        '''Return the image data for the request's song, None if there is none'''
+        directory = os.path.dirname(request.path) if request.path else None
+        cover = self.index.lookup(directory) if directory else None
+        if not cover:
+            return None
+        with open(cover, 'rb') as f:
+            return f.read()
+
+
+SOURCES = {
+    source.name: source for source in (AlbumArtSource, ReadPictureSource, EmbeddedArtSource, DirectoryArtSource)
+}
+
+
+class SourceStats:
+    '''Outcome counters and latency of one art source'''
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+
+    def summary(self):
+        '''Return the counters as a single line'''
+        line = f"hits={self.hits} misses={self.misses} timeouts={self.timeouts} errors={self.errors}"
+        if self.latency.total:
+            line += " " + self.latency.summary()
+        return line
+
+
+class ArtPipeline:
+    '''Run the art sources concurrently, the best ranked one to find an image wins'''
+    def __init__(self, new_connection, source_names=("albumart", "readpicture", "embedded", "directory"), width=None):
+        # Called with a name, returns a new MPDConnection
+        self.new_connection = new_connection
+        # Images are decoded straight to this width
+        self.width = width
+        self.sources = []
+        for name in source_names:
+            if name in SOURCES:
+                self.sources.append(SOURCES[name]())
+            else:
+                print(f"Unknown album art source: {name}")
+        self.stats = {source.name: SourceStats() for source in self.sources}
+        self.stats_lock = threading.Lock()
+        # Enough threads for two songs to race every source at once
+        self.executor = ThreadPoolExecutor(max_workers=2 * len(self.sources) or 1, thread_name_prefix="pyamp-art-source")
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        # Requests being resolved, cancelled by close()
+        self.requests = set()
+
+    def connection(self):
+        '''Return the MPD connection of the calling thread'''
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = self.new_connection("art")
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def run_source(self, source, request):
+        '''Fetch and decode the art from one source, None on a miss or an error'''
+        if request.cancelled:
+            return None
+        start = perf_counter()
+        error = False
+        lost = False
+        image = None
+        try:
+            data = source.fetch(request)
+            image = decode_image(data, self.width) if data else None
+        except CommandError:
+            # MPD has no art for the song, the connection is fine
+            pass
+        except CONNECTION_ERRORS as e:
+            error = True
+            if source.remote:
+                # The connection is broken, or was shut down by cancel()
+                lost = True
+            else:
+                print(f"An error occurred while reading album art ({source.name}): ", e)
+        except Exception as e:
+            # A bug or an unreadable image, the connection is fine
+            error = True
+            print(f"An error occurred while resolving album art ({source.name}): ", e)
+        finally:
+            connection = getattr(self.local, "connection", None)
+            if connection is not None and request.owns(connection) and not request.release(connection):
+                # cancel() may have interrupted it
+                lost = True
+        if lost and connection is not None:
+            # The next source reconnects
+            connection.drop()
+        with self.stats_lock:
+            if request.cancelled or source.name in request.timed_out:
+                return image
+            stats = self.stats[source.name]
+            if image:
+                stats.hits += 1
+            elif error:
+                stats.errors += 1
+            else:
+                stats.misses += 1
+            stats.latency.record(perf_counter() - start)
+        return image
+
+    @staticmethod
+    def best_hit(results, count):
+        '''Return the image of the best ranked source that found one, None while a source ranked above it hasn't answered'''
+        for rank in range(count):
+            if rank not in results:
+                return None
+            if results[rank]:
+                return results[rank]
+        return None
+
+    def fetch(self, song):
+        '''Return the image of the best ranked source that has one as a QImage, None if no source has one'''
+        request = ArtRequest(self, song)
+        with self.lock:
+            self.requests.add(request)
+        start = monotonic()
+        # The sources race, but a hit only wins once every source ranked above it has missed or timed out
+        futures = [self.executor.submit(self.run_source, source, request) for source in self.sources]
+        # Rank to image, None for a miss or a timeout
+        results = {}
+        while True:
+            image = self.best_hit(results, len(futures))
+            pending = [rank for rank in range(len(futures)) if rank not in results]
+            if image or not pending:
+                break
+            now = monotonic()
+            # Sources past their timeout lose the race
+            expired = [rank for rank in pending if start + self.sources[rank].timeout <= now]
+            for rank in expired:
+                results[rank] = None
+                with self.stats_lock:
+                    request.timed_out.add(self.sources[rank].name)
+                    self.stats[self.sources[rank].name].timeouts += 1
+            if expired:
+                continue
+            timeout = min(start + self.sources[rank].timeout for rank in pending) - now
+            done, _ = wait([futures[rank] for rank in pending], timeout=timeout, return_when=FIRST_COMPLETED)
+            for rank in pending:
+                if futures[rank] in done:
+                    results[rank] = futures[rank].result()
+        # The losers are cancelled, or interrupted if they are already running
+        for rank, future in enumerate(futures):
+            if rank not in results:
+                future.cancel()
+        request.cancel()
+        with self.lock:
+            self.requests.discard(request)
+        return image
+
+    def report(self):
+        '''Return the counters of every source'''
+        return "\n".join(f"{name}: {stats.summary()}" for name, stats in self.stats.items())
+
+    def close(self):
+        '''Interrupt the running sources, wait for them and disconnect'''
+        with self.lock:
+            requests = list(self.requests)
+        for request in requests:
+            request.cancel()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        for connection in self.connections:
+            connection.drop()
@@ -0,0 +1,113 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import base64
+import struct
+from time import perf_counter
+from PySide6.QtGui import QPixmap, QIcon, QImage
+
+# Magic, width, height, format, bytes per line, source mtime, source size
+HEADER = struct.Struct("<4sIIIIqq")
+MAGIC = b"PYA1"
+# Pixel format of the stored images, 4 bytes per pixel
+STORED_FORMAT = QImage.Format_ARGB32_Premultiplied
+
+
+class AssetCache:
+    '''Decode theme images once and share the pixmaps and icons across windows'''
+    def __init__(self, cache_dir="~/.cache/pyamp/assets"):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        # Keyed by (theme, asset name)
+        self.pixmaps = {}
+        self.icons = {}
+        # Seconds spent loading and decoding images
+        self.load_time = 0.0
+
+    def pixmap(self, theme_manager, name):
+        '''Return the shared pixmap for the given asset of the theme'''
+        key = (theme_manager.theme, name)
+        if key not in self.pixmaps:
+            self.pixmaps[key] = QPixmap.fromImage(self.load_image(theme_manager, name))
+        return self.pixmaps[key]
+
+    def icon(self, theme_manager, name):
+        '''Return the shared icon for the given asset of the theme'''
+        key = (theme_manager.theme, name)
+        if key not in self.icons:
+            self.icons[key] = QIcon(self.pixmap(theme_manager, name))
+        return self.icons[key]
+
+    def load_image(self, theme_manager, name):
+        '''Load the decoded image from disk, decoding and storing it on a miss'''
+        start = perf_counter()
+        path = os.path.join(self.cache_dir, theme_manager.theme, name + ".raw")
+        stamp = theme_manager.images_stamp()
+        image = self.read_raw(path, stamp)
+        if image is None:
+            image = QImage.fromData(base64.b64decode(theme_manager.get_image(name)))
+            # Indexed images would lose their color table once stored as raw pixels
+            image = image.convertToFormat(STORED_FORMAT)
+            self.write_raw(path, stamp, image)
+        self.load_time += perf_counter() - start
+        return image
+
+    def read_raw(self, path, stamp):
+        '''Read an image stored by write_raw, None if missing or outdated'''
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            magic, width, height, image_format, bytes_per_line, mtime, size = HEADER.unpack_from(data)
+            if magic != MAGIC or (mtime, size) != stamp:
+                return None
+            # Only what write_raw stores is accepted, a truncated or damaged file would be read past its end
+            if (
+                image_format != STORED_FORMAT.value or width == 0 or height == 0
+                or bytes_per_line < width * 4 or len(data) - HEADER.size != bytes_per_line * height
+            ):
+                return None
+            # The QImage doesn't own the buffer, copy it before data goes away
+            return QImage(
+                data[HEADER.size:], width, height, bytes_per_line, QImage.Format(image_format)
+            ).copy()
+        except (OSError, struct.error):
+            return None
+
+    def write_raw(self, path, stamp, image):
+        '''Store the decoded pixels so the next launch skips PNG decoding'''
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            header = HEADER.pack(
+                MAGIC, image.width(), image.height(), image.format().value, image.bytesPerLine(), *stamp
+            )
+            # Written aside and renamed, a crash or another instance never leaves half an image behind
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, 'wb') as f:
+                f.write(header)
+                f.write(bytes(image.constBits()))
+            os.replace(temporary, path)
+        except OSError as e:
+            print("An error occurred while caching a theme image: ", e)
+
+
+ASSET_CACHE = None
+
+
+def get_asset_cache():
+    '''Return the process wide asset cache'''
+    global ASSET_CACHE
+    if ASSET_CACHE is None:
+        ASSET_CACHE = AssetCache()
+    return ASSET_CACHE
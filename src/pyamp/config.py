@@ -15,6 +15,48 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import os
 import yaml
+from PySide6.QtCore import QFileSystemWatcher, QObject, QTimer, Signal
+
+# Every option with its type and default value, values in the file are converted to the type
+SCHEMA = {
+    'host': (str, 'localhost'),
+    'port': (str, '6600'),
+    'song_format': (list, ['title', 'artist', 'album']),
+    'run_on_song_change': (str, ''),
+    'hook_workers': (int, 2),
+    'hook_timeout': (float, 10),
+    'plugins': (list, []),
+    'theme': (str, 'main'),
+    'art_sources': (list, ['albumart', 'readpicture', 'embedded', 'directory']),
+    'crawl_covers': (bool, False),
+    'timeout': (float, 10),
+    'add_batch_size': (int, 500),
+    'volume_rate': (int, 10),
+}
+# Options that must be greater than 0, a timeout of 0 would make the sockets non-blocking
+POSITIVE_OPTIONS = {'timeout', 'hook_timeout'}
+# Options applied as soon as the file is saved, the others take effect after a restart
+LIVE_OPTIONS = {
+    'song_format', 'run_on_song_change', 'hook_workers', 'hook_timeout', 'plugins', 'add_batch_size', 'volume_rate'
+}
+
+
+def convert(kind, value):
+    '''Return value as the given type, raising ValueError if it can't be'''
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        if str(value).lower() in ("true", "yes", "on", "1"):
+            return True
+        if str(value).lower() in ("false", "no", "off", "0"):
+            return False
+        raise ValueError(f"expected true or false, got {value!r}")
+    if kind is list:
+        # A single value is a list of one
+        return [str(item) for item in value] if isinstance(value, list) else [str(value)]
+    if isinstance(value, (list, dict)):
+        raise ValueError(f"expected a {kind.__name__}, got {value!r}")
+    return kind(value)
 
 
 class ConfigManager:
@@ -25,13 +67,7 @@ class ConfigManager:
         # Set the config path
         self.config_folder = os.path.dirname(self.config_file)
         # Set the default config
-        self.default_config = {
-            'host': 'localhost',
-            'port': '6600',
-            'song_format': ['title', 'artist', 'album'],
-            'run_on_song_change': '',
-            'theme': 'main',
-        }
+        self.default_config = {key: default for key, (_, default) in SCHEMA.items()}
 
     def create_config_folder(self):
         '''Create folder for the config file'''
@@ -61,13 +97,99 @@ class ConfigManager:
         return config_data
 
     def get_value(self, key):
-        '''Get the value from a key in the config file'''
-        config_data = self.load_config()
-        # Return a list if key is song_format
-        # This ensures the value isn't returned empty or overwritten with the default value
-        # if the user changes it.
-        if key == 'song_format':
-            data = config_data.get(key, self.default_config[key]) or self.default_config[key]
-        else:
-            data = config_data.get(key, self.default_config.get(key))
-        return data
+        '''Get the value from a key in the config file, as parsed by the process wide config'''
+        return getattr(get_config(), key)
+
+
+class Config(QObject):
+    '''The config file parsed once, its options are attributes, e.g. config.song_format'''
+    # Names of the options whose value changed when the file was reloaded
+    changed = Signal(object)
+
+    def __init__(self, config_file="config.yaml"):
+        super().__init__()
+        self.manager = ConfigManager(config_file)
+        self.watcher = None
+        # Editors write files in several steps, the file is read once they're done
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(200)
+        self.reload_timer.timeout.connect(self.reload)
+        self.values = {}
+        self.apply(self.read() or {})
+
+    def apply(self, values):
+        '''Set the options as attributes, the missing ones to their default'''
+        self.values = dict(self.manager.default_config)
+        self.values.update(values)
+        for key, value in self.values.items():
+            setattr(self, key, value)
+
+    def read(self):
+        '''Return the valid options found in the file, the defaults replace the empty ones, None if it can't be read'''
+        try:
+            config_data = self.manager.load_config() or {}
+        except (OSError, yaml.YAMLError) as e:
+            print("An error occurred while reading the config file: ", e)
+            return None
+        if not isinstance(config_data, dict):
+            print("The config file should map option names to values")
+            return None
+        values = {}
+        for key, value in config_data.items():
+            if key not in SCHEMA:
+                print(f"Unknown config option: {key}")
+                continue
+            kind, default = SCHEMA[key]
+            # An empty song_format would show nothing, an empty option means the default
+            if value is None or (key == 'song_format' and not value):
+                values[key] = default
+                continue
+            try:
+                values[key] = convert(kind, value)
+                if key in POSITIVE_OPTIONS and not values[key] > 0:
+                    raise ValueError(f"expected a number greater than 0, got {value!r}")
+            except (TypeError, ValueError) as e:
+                print(f"Invalid value for the config option {key}, using {default!r}: {e}")
+                values[key] = default
+        return values
+
+    def watch(self):
+        '''Reload the file whenever it's saved'''
+        if self.watcher is not None:
+            return
+        self.watcher = QFileSystemWatcher(self)
+        # The folder too, editors saving by renaming a new file over the old one end the file's watch
+        self.watcher.addPaths([self.manager.config_folder, self.manager.config_file])
+        self.watcher.fileChanged.connect(self.reload_timer.start)
+        self.watcher.directoryChanged.connect(self.reload_timer.start)
+
+    def reload(self):
+        '''Read the file again and report the options that changed'''
+        if os.path.exists(self.manager.config_file) and self.manager.config_file not in self.watcher.files():
+            self.watcher.addPath(self.manager.config_file)
+        values = self.read()
+        if values is None:
+            # Most likely saved halfway, the options stay as they are
+            return
+        previous = self.values
+        self.apply(values)
+        keys = {key for key, value in self.values.items() if value != previous[key]}
+        if not keys:
+            return
+        print(f"Config reloaded, changed: {', '.join(sorted(keys))}")
+        restart = sorted(keys - LIVE_OPTIONS)
+        if restart:
+            print(f"Restart pyamp to apply: {', '.join(restart)}")
+        self.changed.emit(keys)
+
+
+CONFIG = None
+
+
+def get_config():
+    '''Return the process wide config'''
+    global CONFIG
+    if CONFIG is None:
+        CONFIG = Config()
+    return CONFIG
@@ -0,0 +1,139 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import random
+import socket
+import threading
+from time import monotonic
+import mpd
+from mpd import MPDClient
+
+# Errors after which a connection can't be used anymore, a CommandError leaves it usable
+CONNECTION_ERRORS = (mpd.ConnectionError, OSError)
+
+
+class Backoff:
+    '''Exponential delays with jitter, so clients don't reconnect in lockstep after a restart'''
+    def __init__(self, base=0.5, cap=30.0):
+        self.base = base
+        self.cap = cap
+        self.attempts = 0
+
+    def next_delay(self):
+        '''Return how long to wait before the next attempt'''
+        delay = min(self.cap, self.base * 2 ** self.attempts)
+        self.attempts += 1
+        # Half of the delay is random
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def reset(self):
+        '''Start over after a successful attempt'''
+        self.attempts = 0
+
+
+class MPDConnection:
+    '''An MPD connection that reconnects itself, used by a single thread at a time'''
+    # Idle connections are pinged this often, MPD drops clients silent for longer than its connection_timeout
+    HEALTH_INTERVAL = 30.0
+
+    def __init__(self, host, port, timeout=None, name="mpd"):
+        self.host = host
+        self.port = port
+        # Socket timeout in seconds, None blocks forever
+        self.timeout = timeout
+        self.name = name
+        self.client = None
+        self.backoff = Backoff()
+        # Set by close(), wakes up the waits between attempts
+        self.closed = threading.Event()
+        self.last_used = monotonic()
+
+    def connect(self, retry=True):
+        '''Return a connected client, retrying with backoff until it connects or close() is called'''
+        while self.client is None:
+            if self.closed.is_set():
+                raise mpd.ConnectionError(f"The {self.name} connection is closed")
+            client = MPDClient()
+            client.timeout = self.timeout
+            try:
+                client.connect(self.host, self.port)
+            except CONNECTION_ERRORS as e:
+                if not retry:
+                    raise
+                delay = self.backoff.next_delay()
+                print(f"Error connecting to MPD ({self.name}): {e}, retrying in {delay:.1f}s")
+                self.closed.wait(delay)
+                continue
+            self.client = client
+            self.last_used = monotonic()
+            if self.backoff.attempts:
+                print(f"Reconnected to MPD ({self.name})")
+            self.backoff.reset()
+        return self.client
+
+    def run(self, function, *args, retry=True):
+        '''Call function(client, *args), reconnecting and trying again once if the connection was lost'''
+        # Without retry the error is raised instead, MPD may have applied the commands before the connection dropped
+        if not retry:
+            # A connection MPD closed while it was unused is found out before anything is sent
+            self.check()
+        for attempt in range(2):
+            client = self.connect()
+            try:
+                result = function(client, *args)
+                self.last_used = monotonic()
+                return result
+            except CONNECTION_ERRORS:
+                self.drop()
+                if attempt or not retry or self.closed.is_set():
+                    raise
+        return None
+
+    def check(self):
+        '''Ping the server if the connection has been unused for a while, dropping it if it's dead'''
+        if self.client is None or monotonic() - self.last_used < self.HEALTH_INTERVAL:
+            return
+        try:
+            self.client.ping()
+            self.last_used = monotonic()
+        except CONNECTION_ERRORS:
+            # The next command reconnects
+            self.drop()
+
+    def drop(self):
+        '''Forget the current client, the next connect() opens a new one'''
+        client = self.client
+        self.client = None
+        if client is not None:
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+
+    def interrupt(self):
+        '''Wake up a command blocked on the socket, from another thread'''
+        client = self.client
+        try:
+            # Shutting down a duplicate of the socket wakes up a pending read
+            with socket.socket(fileno=os.dup(client.fileno())) as sock:
+                sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+
+    def close(self):
+        '''Stop reconnecting and interrupt the pending command, the owning thread drops the client'''
+        self.closed.set()
+        self.interrupt()
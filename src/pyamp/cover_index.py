@@ -0,0 +1,140 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import json
+import threading
+from PySide6.QtCore import QThread
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+# Preferred cover names, best first, the largest image wins when none of them is there
+COVER_NAMES = ("cover", "folder", "front", "album", "albumart")
+
+
+def choose_cover(entries):
+    '''Return the name of the best cover among the DirEntry objects of a directory, None if there is no image'''
+    best = None
+    best_rank = None
+    for entry in entries:
+        stem, extension = os.path.splitext(entry.name.lower())
+        if extension not in IMAGE_EXTENSIONS:
+            continue
+        try:
+            if not entry.is_file():
+                continue
+            size = entry.stat().st_size
+        except OSError:
+            continue
+        # Lower ranks win, then larger files
+        rank = (COVER_NAMES.index(stem) if stem in COVER_NAMES else len(COVER_NAMES), -size)
+        if best_rank is None or rank < best_rank:
+            best = entry.name
+            best_rank = rank
+    return best
+
+
+class CoverIndex:
+    '''Persistent map of directories to their cover file, invalidated by the directory's mtime'''
+    def __init__(self, path="~/.cache/pyamp/covers.json"):
+        self.path = os.path.expanduser(path)
+        # Directory to (mtime_ns, cover name or None)
+        self.directories = {}
+        self.dirty = False
+        # Used from the art source threads and the crawler
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        '''Read the index saved by a previous run'''
+        try:
+            with open(self.path, 'r', encoding="utf-8") as f:
+                data = json.load(f)
+            self.directories = {directory: tuple(entry) for directory, entry in data["directories"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.directories = {}
+
+    def save(self):
+        '''Write the index if it changed since it was loaded'''
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {"directories": dict(self.directories)}
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", 'w', encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as e:
+            print("An error occurred while saving the cover index: ", e)
+
+    def lookup(self, directory):
+        '''Return the path of the directory's cover, None if it has no image'''
+        directory = os.path.normpath(directory)
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.directories.get(directory)
+        # Adding or removing a file changes the directory's mtime, only then is it listed again
+        if entry is None or entry[0] != mtime:
+            entry = self.refresh(directory, mtime)
+        return os.path.join(directory, entry[1]) if entry and entry[1] else None
+
+    def refresh(self, directory, mtime):
+        '''List the directory and store its cover'''
+        try:
+            with os.scandir(directory) as entries:
+                entry = (mtime, choose_cover(entries))
+        except OSError:
+            return None
+        with self.lock:
+            self.directories[directory] = entry
+            self.dirty = True
+        return entry
+
+
+class CoverCrawler(QThread):
+    '''Index the cover of every directory under the music directory ahead of time'''
+    def __init__(self, index, music_dir):
+        super().__init__()
+        self.index = index
+        self.music_dir = music_dir
+        self.running = True
+
+    def run(self):
+        '''Walk the music directory, refreshing the directories that changed'''
+        for directory, _, _ in os.walk(self.music_dir):
+            if not self.running:
+                break
+            self.index.lookup(directory)
+        self.index.save()
+
+    def stop(self):
+        '''Stop after the current directory and wait for the thread to finish'''
+        self.running = False
+        self.wait()
+
+
+COVER_INDEX = None
+
+
+def get_cover_index():
+    '''Return the process wide cover index'''
+    global COVER_INDEX
+    if COVER_INDEX is None:
+        COVER_INDEX = CoverIndex()
+    return COVER_INDEX
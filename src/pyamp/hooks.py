@@ -0,0 +1,156 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import json
+import shlex
+import signal
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from pyamp.mpd_core import LatencyHistogram
+
+# Song tags passed to hooks as PYAMP_<TAG> environment variables
+HOOK_TAGS = ("title", "artist", "album", "albumartist", "track", "date", "genre", "file", "duration")
+
+
+def hook_payload(event, song, status):
+    '''Return the environment variables and the JSON document describing an event'''
+    environment = {"PYAMP_EVENT": event, "PYAMP_STATE": status.get("state", "")}
+    for tag in HOOK_TAGS:
+        value = song.get(tag, "")
+        # Tags set more than once come as lists
+        environment["PYAMP_" + tag.upper()] = "; ".join(value) if isinstance(value, list) else str(value)
+    document = json.dumps({"event": event, "song": song, "status": status})
+    return environment, document
+
+
+class HookRunner:
+    '''Run the user's hook command on a few threads, so slow scripts never hold up the GUI'''
+    def __init__(self, command, workers=2, timeout=10.0):
+        # The event name is still passed as the first argument, for scripts written before the payload
+        self.command = shlex.split(command) if command else []
+        self.workers = max(1, workers)
+        # Seconds before a hook is killed
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pyamp-hook")
+        self.lock = threading.Lock()
+        self.running = 0
+        # Latest event of each type waiting for a free worker, in the order they came
+        self.pending = {}
+        self.processes = set()
+        self.closed = False
+        self.latency = LatencyHistogram()
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def configure(self, command, workers, timeout):
+        '''Use new settings from the next event on, running hooks finish with the old ones'''
+        with self.lock:
+            self.command = shlex.split(command) if command else []
+            self.timeout = timeout
+            if max(1, workers) > self.workers:
+                # The pool can't grow, hooks already running finish on the old one
+                self.executor.shutdown(wait=False)
+                self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="pyamp-hook")
+            self.workers = max(1, workers)
+
+    def run(self, event, song, status):
+        '''Run the hook for an event, dropping the older one of the same type if it's still waiting to run'''
+        if not self.command or self.closed:
+            return
+        payload = (event,) + hook_payload(event, song, status)
+        with self.lock:
+            if self.running >= self.workers:
+                if self.pending.pop(event, None) is not None:
+                    self.coalesced += 1
+                self.pending[event] = payload
+                return
+            self.running += 1
+        self.executor.submit(self.work, payload)
+
+    def work(self, payload):
+        '''Run hooks until no event is waiting'''
+        while payload is not None:
+            self.run_hook(*payload)
+            with self.lock:
+                payload = self.pending.pop(next(iter(self.pending)), None) if self.pending else None
+                if payload is None or self.closed:
+                    self.running -= 1
+                    return
+
+    def run_hook(self, event, environment, document):
+        '''Start the hook, feed it the JSON payload and kill it if it runs for too long'''
+        start = perf_counter()
+        try:
+            # In its own process group, so the programs it starts are killed along with it
+            process = subprocess.Popen(
+                self.command + [event], stdin=subprocess.PIPE, env={**os.environ, **environment},
+                start_new_session=True
+            )
+        except OSError as e:
+            print("An error occurred while running the custom command: ", e)
+            return
+        with self.lock:
+            # close() only kills the hooks it can see, one started while it ran is killed here
+            closed = self.closed
+            if not closed:
+                self.processes.add(process)
+        if closed:
+            self.kill(process)
+            return
+        try:
+            process.communicate(document.encode("utf-8"), timeout=self.timeout)
+            result = f"exit code {process.returncode}"
+        except subprocess.TimeoutExpired:
+            self.kill(process)
+            self.timeouts += 1
+            result = f"killed after {self.timeout}s"
+        finally:
+            with self.lock:
+                self.processes.discard(process)
+        elapsed = perf_counter() - start
+        self.latency.record(elapsed)
+        print(f"Hook {event}: {result} in {elapsed * 1000:.0f}ms")
+
+    @staticmethod
+    def kill(process):
+        '''Terminate the hook and what it started, then kill them if they don't exit'''
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(1)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+        except OSError:
+            pass
+
+    def report(self):
+        '''Return how long the hooks took, how many were coalesced and how many timed out'''
+        line = f"Hooks: coalesced={self.coalesced} timeouts={self.timeouts}"
+        if self.latency.total:
+            line += " " + self.latency.summary()
+        return line
+
+    def close(self):
+        '''Drop the waiting event and kill the running hooks'''
+        with self.lock:
+            self.closed = True
+            self.pending.clear()
+            processes = list(self.processes)
+        for process in processes:
+            self.kill(process)
+        self.executor.shutdown(wait=True)
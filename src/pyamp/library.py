@@ -0,0 +1,326 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import sys
+import struct
+import posixpath
+from itertools import compress
+from time import monotonic
+from mpd import CommandError
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QThread, Signal
+
+
+def tag_value(song, key):
+    '''Return a tag of the song as a single string'''
+    value = song.get(key, "")
+    # MPD returns a list when a tag is set more than once
+    if isinstance(value, list):
+        value = value[0]
+    return value
+
+
+def song_columns(songs):
+    '''Split songs returned by MPD into file, title, artist and album columns'''
+    return (
+        [song.get("file", "") for song in songs],
+        [tag_value(song, "title") for song in songs],
+        [tag_value(song, "artist") for song in songs],
+        [tag_value(song, "album") for song in songs],
+    )
+
+
+def extend_columns(columns, other):
+    '''Append the rows of other to columns'''
+    for column, values in zip(columns, other):
+        column.extend(values)
+
+
+def slice_columns(columns, start, end):
+    '''Return the rows from start to end of the given columns'''
+    return tuple(column[start:end] for column in columns)
+
+
+class TrackStore:
+    '''Column oriented storage for the tracks of the library'''
+    def __init__(self):
+        # One list per tag, a track id is an index in every column
+        self.files = []
+        self.titles = []
+        self.artists = []
+        self.albums = []
+
+    def __len__(self):
+        return len(self.files)
+
+    def add_songs(self, songs):
+        '''Append the songs returned by MPD'''
+        self.add_columns(song_columns(songs))
+
+    def add_columns(self, columns):
+        '''Append tracks given as file, title, artist and album columns'''
+        files, titles, artists, albums = columns
+        # Artists and albums repeat a lot, interning stores each of them once
+        intern = sys.intern
+        self.files.extend(files)
+        self.titles.extend(titles)
+        self.artists.extend(map(intern, artists))
+        self.albums.extend(map(intern, albums))
+
+    def clear(self):
+        '''Remove every track'''
+        self.files.clear()
+        self.titles.clear()
+        self.artists.clear()
+        self.albums.clear()
+
+
+class SongListModel(QAbstractListModel):
+    '''List model showing the titles of a TrackStore'''
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        # Track ids of the visible rows, None shows the whole store
+        self.rows = None
+
+    def rowCount(self, parent=QModelIndex()): # pylint: disable=C0103
+        '''Return the number of visible rows'''
+        if parent.isValid():
+            return 0
+        return len(self.store) if self.rows is None else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        '''Return the title shown in the given row'''
+        if role == Qt.DisplayRole and index.isValid():
+            return self.store.titles[self.track_id(index.row())]
+        return None
+
+    def track_id(self, row):
+        '''Return the track id shown in the given row'''
+        return row if self.rows is None else self.rows[row]
+
+    def add_columns(self, columns):
+        '''Append the tracks with a title to the store'''
+        # Songs without a title have never been listed
+        titles = columns[1]
+        if not all(titles):
+            columns = tuple(list(compress(column, titles)) for column in columns)
+        count = len(columns[0])
+        if not count:
+            return
+        first = len(self.store)
+        if self.rows is None:
+            self.beginInsertRows(QModelIndex(), first, first + count - 1)
+            self.store.add_columns(columns)
+            self.endInsertRows()
+        else:
+            self.store.add_columns(columns)
+
+    def set_rows(self, rows):
+        '''Only show the given track ids, or every track if rows is None'''
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+    def clear(self):
+        '''Remove every track'''
+        self.beginResetModel()
+        self.store.clear()
+        self.rows = None
+        self.endResetModel()
+
+
+# Magic, MPD's db_update stamp, number of songs, then the length of each column
+CACHE_HEADER = struct.Struct("<4sqIQQQQ")
+CACHE_MAGIC = b"PYL1"
+
+
+class LibraryCache:
+    '''Copy of the library on disk, valid until MPD's database is updated'''
+    def __init__(self, path="~/.cache/pyamp/library.cache"):
+        self.path = os.path.expanduser(path)
+
+    def load(self):
+        '''Return the db_update stamp and columns of the cached library, None if missing or unreadable'''
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            magic, db_update, count, *lengths = CACHE_HEADER.unpack_from(data)
+            if magic != CACHE_MAGIC:
+                return None
+            columns = []
+            offset = CACHE_HEADER.size
+            for length in lengths:
+                # MPD's protocol is line based, no tag can hold a NUL
+                column = data[offset:offset + length].decode("utf-8").split("\0") if count else []
+                if len(column) != count:
+                    return None
+                columns.append(column)
+                offset += length
+            return db_update, tuple(columns)
+        except (OSError, struct.error, UnicodeDecodeError):
+            return None
+
+    def save(self, db_update, columns):
+        '''Replace the cached library'''
+        encoded = [("\0".join(column)).encode("utf-8") for column in columns]
+        header = CACHE_HEADER.pack(CACHE_MAGIC, db_update, len(columns[0]), *(len(data) for data in encoded))
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Written aside and renamed, a crash never leaves half a cache behind
+            with open(self.path + ".tmp", 'wb') as f:
+                f.write(header)
+                for data in encoded:
+                    f.write(data)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as e:
+            print("An error occurred while writing the library cache: ", e)
+
+
+class LibraryLoader(QThread):
+    '''Load the library from the disk cache or stream it from MPD on a dedicated connection'''
+    libraryReset = Signal()
+    # File, title, artist and album columns of the next songs
+    songsLoaded = Signal(object)
+    loadFinished = Signal(int)
+
+    # Emit a batch once it holds this many songs or is this old, in seconds
+    BATCH_SIZE = 1000
+    CACHED_BATCH_SIZE = 50000
+    BATCH_AGE = 0.1
+
+    def __init__(self, connection, cache, update=False):
+        super().__init__()
+        self.cache = cache
+        # Only re-fetch what changed since the cached library, used after MPD updates its database
+        self.update = update
+        # listallinfo would block until the whole library is serialized, lsinfo answers per directory
+        self.connection = connection
+        self.client = None
+        # Set before the thread starts so an early cancel() is never lost
+        self.running = True
+        self.loaded = 0
+
+    def run(self):
+        '''Emit the library in batches, preceded by libraryReset, then cache it'''
+        try:
+            self.client = self.connection.connect()
+            stats = self.client.stats()
+            db_update = int(stats.get("db_update", 0))
+            cached = self.cache.load()
+            columns = None
+            if cached is not None and cached[0] == db_update:
+                if self.update:
+                    # Nothing changed, the list is already up to date
+                    return
+                columns = cached[1]
+            elif cached is not None and self.update:
+                columns = self.fetch_changes(cached, stats)
+            if columns is not None:
+                self.emit_columns(columns)
+            else:
+                columns = self.walk()
+            if self.running and (cached is None or cached[0] != db_update):
+                self.cache.save(db_update, columns)
+        except Exception as e:
+            # Errors are expected when cancel() pulls the socket from under a command
+            if self.running:
+                print("An error occurred while loading the library: ", e)
+        finally:
+            self.connection.drop()
+        if self.running:
+            self.loadFinished.emit(self.loaded)
+
+    def emit_columns(self, columns):
+        '''Replace the library with the given columns'''
+        self.libraryReset.emit()
+        count = len(columns[0])
+        for start in range(0, count, self.CACHED_BATCH_SIZE):
+            if not self.running:
+                break
+            self.songsLoaded.emit(slice_columns(columns, start, start + self.CACHED_BATCH_SIZE))
+        self.loaded = count
+
+    def walk(self):
+        '''Walk the music directory, emitting its songs as they arrive'''
+        self.libraryReset.emit()
+        columns = ([], [], [], [])
+        songs = []
+        batch_time = monotonic()
+        # Depth first, so songs arrive in the same order as listallinfo
+        directories = [""]
+        while directories and self.running:
+            entries = self.client.lsinfo(directories.pop())
+            subdirectories = []
+            for entry in entries:
+                if "directory" in entry:
+                    subdirectories.append(entry["directory"])
+                elif "file" in entry:
+                    songs.append(entry)
+            directories.extend(reversed(subdirectories))
+            if len(songs) >= self.BATCH_SIZE or (songs and monotonic() - batch_time >= self.BATCH_AGE):
+                self.emit_batch(columns, songs)
+                songs = []
+                batch_time = monotonic()
+        if songs and self.running:
+            self.emit_batch(columns, songs)
+        self.loaded = len(columns[0])
+        return columns
+
+    def emit_batch(self, columns, songs):
+        '''Emit a batch of songs and append it to the columns of the library'''
+        batch = song_columns(songs)
+        extend_columns(columns, batch)
+        self.songsLoaded.emit(batch)
+
+    def fetch_changes(self, cached, stats):
+        '''Patch the cached library with the directories changed since it was cached, None if it can't be'''
+        since, (files, *tags) = cached
+        # Songs whose file changed point to the directories to list again
+        changed = self.client.find("modified-since", str(since))
+        directories = {posixpath.dirname(song["file"]) for song in changed}
+        listings = {}
+        for directory in directories:
+            try:
+                entries = self.client.lsinfo(directory)
+            except CommandError:
+                # The directory is gone
+                entries = []
+            listings[directory] = song_columns([entry for entry in entries if "file" in entry])
+        columns = ([], [], [], [])
+        for track_id, file in enumerate(files):
+            directory = posixpath.dirname(file)
+            if directory not in directories:
+                for column, value in zip(columns, (file, *(tag[track_id] for tag in tags))):
+                    column.append(value)
+            elif directory in listings:
+                # The new listing takes the place of the directory's first song
+                extend_columns(columns, listings.pop(directory))
+        # Directories that weren't there before go last
+        for listing in listings.values():
+            extend_columns(columns, listing)
+        # Removals elsewhere don't show up as modified, fetch everything if the count is off
+        if len(columns[0]) != int(stats.get("songs", -1)):
+            return None
+        # An update that finished while patching isn't in the listings
+        if self.client.stats().get("db_update") != stats.get("db_update"):
+            return None
+        return columns
+
+    def cancel(self):
+        '''Stop loading and wait for the thread to finish, batches already emitted are kept'''
+        self.running = False
+        self.connection.close()
+        self.wait()
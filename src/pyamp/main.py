@@ -14,14 +14,22 @@
 #    You should have received a copy of the GNU General Public License
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import sys
+# Imported first, it notes when pyamp started for the time to first paint
+from pyamp.startup import get_startup_clock
 from PySide6.QtWidgets import QApplication
 from pyamp.main_window import MainWindow
 from pyamp.mpd_core import MPDManager
-from pyamp.config import ConfigManager
+from pyamp.config import ConfigManager, get_config
+from pyamp.assets import get_asset_cache
 
 
 def main():
-    '''Run Pyamp'''
+    '''Run Pyamp, with --profile-startup the time each startup phase took is printed'''
+    startup_clock = get_startup_clock()
+    startup_clock.mark("imports")
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        startup_clock.profile = True
     print(
     "Pyamp 1.1.0 - Copyright (C) 2024  Ignacio Gonsalves"
     )
@@ -33,12 +41,20 @@ def main():
             print("Successfully created config file/folder!")
         except Exception as e:
             print("An error occurred while creating the config file/folder: ", e)
+    get_config()
+    startup_clock.mark("config")
     # Set app
     app = QApplication(sys.argv)
-    # Set the mpd sesh
+    # Options are applied as soon as the config file is saved
+    get_config().watch()
+    startup_clock.mark("qt init")
+    # Set the mpd sesh, it connects in the background
     mpd_manager = MPDManager()
+    mpd_manager.status_watcher.connectionChanged.connect(startup_clock.connection_changed)
     # Set the window and open pyamp
     window = MainWindow(mpd_manager)
+    startup_clock.mark("window build")
+    startup_clock.detail("theme decode", get_asset_cache().load_time)
     window.show()
     # Exit when finished
     sys.exit(app.exec())
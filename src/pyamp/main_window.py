@@ -13,9 +13,7 @@
 #
 #    You should have received a copy of the GNU General Public License
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
-import subprocess
 from time import strftime, localtime
-import base64
 from PySide6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -29,20 +27,28 @@ from PySide6.QtWidgets import (
     QLabel,
     QVBoxLayout
 )
-from PySide6.QtGui import QPixmap, QPainter, QFont, QIcon, QImage
+from PySide6.QtGui import QPainter, QFont
 from PySide6.QtCore import QTimer, Qt, Signal
 from pyamp.song_picker import SongPickerWindow
 from pyamp.album_cover import AlbumCoverWindow
-from pyamp.ui import createTitleBar, NonSelectableLineEdit, CreateSpacer
-from pyamp.config import ConfigManager
+from pyamp.ui import createTitleBar, CreateSpacer
+from pyamp.marquee import Marquee
+from pyamp.scheduler import UiScheduler
+from pyamp.hooks import HookRunner
+from pyamp.plugins import PluginManager
+from pyamp.volume import VolumeControl
+from pyamp.config import get_config
+from pyamp.startup import get_startup_clock
 from pyamp.theme import ThemeManager
+from pyamp.assets import get_asset_cache
+from pyamp.status import PlaybackClock
 
 
 # Main window
 class MainWindow(QMainWindow):
     '''Main window'''
     # Define the song changed signal for the album cover display
-    songChanged = Signal()
+    songChanged = Signal(dict)
 
     def __init__(self, mpd_manager):
         super().__init__()
@@ -56,62 +62,50 @@ class MainWindow(QMainWindow):
         theme_manager = ThemeManager()
 
         (
-            img_song_picker_background,
-            img_background,
-            img_op_background,
-            img_next,
-            img_prev,
-            img_toggle,
-            img_album,
-            img_stop,
-            img_add,
             stylesheet,
             spicker_stylesheet,
             tbar_stylesheet,
             options_stylesheet,
-        ) = theme_manager.get_theme()
+        ) = theme_manager.get_stylesheets()
+        assets = get_asset_cache()
 
         # Window background and alpha channel
-        # Decode the base64 image data
-        background_data = base64.b64decode(img_background)
-
-        # Create a QPixmap from the binary data
-        background_pixmap = QPixmap()
-        background_pixmap.loadFromData(background_data)
+        background_pixmap = assets.pixmap(theme_manager, "background")
 
         # Set the background image and mask
         self.background_image = background_pixmap
         self.setMask(self.background_image.mask())
 
-        # Config file
-        self.config_manager = ConfigManager()
-        self.song_order = self.config_manager.get_value("song_format")
-        self.user_command = self.config_manager.get_value("run_on_song_change")
+        # Config file, parsed once and reloaded when it's saved
+        self.config = get_config()
+        self.config.changed.connect(self.config_changed)
+        # Runs run_on_song_change off the GUI thread, with a timeout
+        self.hook_runner = HookRunner(self.config.run_on_song_change, self.config.hook_workers, self.config.hook_timeout)
+        # Python plugins, called on a worker thread without starting a process
+        self.plugins = PluginManager(self.config.plugins)
 
         # MPD setup
-        self.client = mpd_manager.get_client()
-        self.mpd_status = self.client.status()
+        self.mpd_manager = mpd_manager
+        self.status_watcher = mpd_manager.status_watcher
+        self.playback_clock = PlaybackClock()
+        # Runs the periodic updates of the window
+        self.scheduler = UiScheduler(self)
+        # Reports the time to first paint
+        self.startup_clock = get_startup_clock()
+        self.mpd_status = {}
+        # Until the status watcher connects, and while it reconnects
+        self.connected = False
+        # Songs added so far and in total while the song picker's selection is being added
+        self.adding = None
+        self.current_song_info = {}
         self.playstate = ""
         self.songs_played = 0
         self.current_song = ''
         self.current_song_title = ''
         self.current_artist = ''
         self.current_album = ''
-        if not self.song_order:
-            self.song_format = "{playstate} {title} - {artist} - {album}"
-            print("Song format is empty, falling back to the default format")
-        else:
-            try:
-                self.song_format = "{playstate} " + " - ".join(
-                    ["{" + item + "}" for item in self.song_order]
-                    )
-            except Exception as e:
-                print(
-                    f"An error occurred while reading the song format from the config file: "
-                    f"{e}. Falling back to the default format"
-                )
-
-                self.song_format = "{playstate} {title} - {artist} - {album}"
+        self.song_format = ''
+        self.set_song_format(self.config.song_format)
 
         # Clock setup
         self.current_time = strftime("%H:%M")
@@ -133,8 +127,11 @@ class MainWindow(QMainWindow):
         self.spacer2 = CreateSpacer(8, 8, QSizePolicy.Fixed, QSizePolicy.Fixed)
         self.layout.addItem(self.spacer2, 1, 3, 2, 1)
 
-        # Title bar
-        self.title_bar = createTitleBar(self, "Pyamp 1.1.0", tbar_stylesheet, mpd_manager, img_op_background, options_stylesheet, button=True)
+        # Title bar, the options background is decoded when the options window is first opened
+        self.title_bar = createTitleBar(
+            self, "Pyamp 1.1.0", tbar_stylesheet, mpd_manager,
+            lambda: assets.pixmap(theme_manager, "options_background"), options_stylesheet, button=True
+        )
         self.setMenuWidget(self.title_bar)
 
         # Containers
@@ -164,26 +161,16 @@ class MainWindow(QMainWindow):
         self.display_container_layout.addWidget(self.clock_display)
         self.display_container_layout.insertWidget(0, self.clock_display)
 
-        # Timer for updating the clock display in realtime.
-        self.clock_timer = QTimer()
-        self.clock_timer.timeout.connect(self.clock_update)
-
         # Song display
-        self.song_display = NonSelectableLineEdit(central_widget)
+        # Scrolls the song when it doesn't fit, only while the window is shown
+        self.song_display = Marquee(central_widget)
         self.song_display.setStyleSheet(stylesheet)
         self.song_display.setFixedHeight(30)
         self.song_display.setFixedWidth(260)
         self.song_display.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Minimum)
-        self.song_display.setReadOnly(True)
-        self.song_display.setCursorPosition(0)
         self.song_container_layout.addWidget(self.song_display)
         self.song_container_layout.insertWidget(0, self.song_display)
 
-        # Timer to scroll the current song text
-        self.scroll_timer = QTimer(self)
-        self.scroll_timer.timeout.connect(self.scroll_text)
-        self.delay_active = None
-
         # Progress bar
         self.progress_bar = QProgressBar(central_widget)
         self.progress_bar.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Minimum)
@@ -191,19 +178,20 @@ class MainWindow(QMainWindow):
         self.progress_bar.setFixedHeight(20)
         self.song_container_layout.addWidget(self.progress_bar)
 
-        # Timer to update progress bar periodically
-        self.progress_timer = QTimer(self)
-        self.progress_timer.timeout.connect(self.update_progress)
-
         # Volume slider
         self.volume_slider = QSlider(Qt.Horizontal)
         self.volume_slider.setFixedHeight(15)
         self.volume_slider.setStyleSheet(stylesheet)
         self.volume_slider.setRange(0, 100)
         self.volume_slider.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
-        mpd_volume = self.get_slider_value()
-        self.volume_slider.setValue(mpd_volume)
+        # Synced with MPD's mixer once the status watcher starts
+        self.volume_slider.setValue(50)
         self.volume_slider.valueChanged.connect(self.volume_changed)
+        # Dragging sends at most volume_rate commands a second, the last value is sent on release
+        self.volume_control = VolumeControl(mpd_manager, self.config.volume_rate)
+        self.volume_slider.sliderReleased.connect(self.volume_control.flush)
+        # Keys and the mouse wheel change the volume relative to MPD's
+        self.slider_volume = self.volume_slider.value()
         self.panel_container_layout.addWidget(self.volume_slider)
         self.panel_container_layout.insertWidget(0, self.volume_slider)
 
@@ -215,7 +203,7 @@ class MainWindow(QMainWindow):
 
         # Buttons
         # Previous song button
-        prev_icon = QIcon(QPixmap.fromImage(QImage.fromData(base64.b64decode(img_prev))))
+        prev_icon = assets.icon(theme_manager, "prev")
         self.prev = QPushButton("", self)
         self.prev.setFixedHeight(25)
         self.prev.setFixedWidth(25)
@@ -225,7 +213,7 @@ class MainWindow(QMainWindow):
         self.prev.clicked.connect(self.on_prev_press)
 
         # Stop button
-        stop_icon = QIcon(QPixmap.fromImage(QImage.fromData(base64.b64decode(img_stop))))
+        stop_icon = assets.icon(theme_manager, "stop")
         self.stop = QPushButton("", self)
         self.stop.setFixedHeight(25)
         self.stop.setFixedWidth(25)
@@ -235,7 +223,7 @@ class MainWindow(QMainWindow):
         self.stop.clicked.connect(self.on_stop_press)
 
         # Play/Pause button
-        toggle_icon = QIcon(QPixmap.fromImage(QImage.fromData(base64.b64decode(img_toggle))))
+        toggle_icon = assets.icon(theme_manager, "toggle")
         self.toggle = QPushButton("", self)
         self.toggle.setCheckable(True)
         self.toggle.setFixedHeight(25)
@@ -246,23 +234,22 @@ class MainWindow(QMainWindow):
         self.toggle.clicked.connect(self.on_play_toggle)
 
         # Song picker button
-        add_icon = QIcon(QPixmap.fromImage(QImage.fromData(base64.b64decode(img_add))))
+        add_icon = assets.icon(theme_manager, "add")
         self.add = QPushButton("", self)
         self.add.setFixedHeight(25)
         self.add.setFixedWidth(25)
         self.button_container_layout.addWidget(self.add)
         self.add.setIcon(add_icon)
         self.add.setStyleSheet(stylesheet)
-        self.song_picker_window = SongPickerWindow(
-            mpd_manager,
-            img_song_picker_background,
-            spicker_stylesheet,
-            tbar_stylesheet,
-        )
+        # The song picker and album art windows are built once the window has been painted, or when opened
+        self.theme_manager = theme_manager
+        self.spicker_stylesheet = spicker_stylesheet
+        self.tbar_stylesheet = tbar_stylesheet
+        self.song_picker_window = None
         self.add.clicked.connect(self.open_song_picker)
 
         # Next song button
-        next_icon = QIcon(QPixmap.fromImage(QImage.fromData(base64.b64decode(img_next))))
+        next_icon = assets.icon(theme_manager, "next")
         self.next = QPushButton("", self)
         self.next.setFixedHeight(25)
         self.next.setFixedWidth(25)
@@ -272,250 +259,323 @@ class MainWindow(QMainWindow):
         self.next.clicked.connect(self.on_next_press)
 
         # Album art button
-        album_icon = QIcon(QPixmap.fromImage(QImage.fromData(base64.b64decode(img_album))))
+        album_icon = assets.icon(theme_manager, "album")
         self.album = QPushButton("", self)
         self.album.setFixedHeight(25)
         self.album.setFixedWidth(25)
         self.button_container_layout.addWidget(self.album)
         self.album.setIcon(album_icon)
         self.album.setStyleSheet(stylesheet)
-        self.album_display = AlbumCoverWindow(mpd_manager, self)
-        self.album.clicked.connect(lambda: self.album_display.show()) # pylint: disable=W0108
-
-        # Timer checking for song changes
-        self.check_song_change_timer = QTimer(self)
-        self.check_song_change_timer.timeout.connect(self.check_song_change)
-        self.previous_song = None
+        self.album_display = None
+        self.album.clicked.connect(lambda: self.album_window().show())
 
         # duhh
         self.startup()
 
+    def set_song_format(self, song_order):
+        '''Build the song display's format from the song_format option'''
+        self.song_order = song_order
+        if not self.song_order:
+            self.song_format = "{playstate} {title} - {artist} - {album}"
+            print("Song format is empty, falling back to the default format")
+        else:
+            try:
+                self.song_format = "{playstate} " + " - ".join(
+                    ["{" + item + "}" for item in self.song_order]
+                    )
+            except Exception as e:
+                print(
+                    f"An error occurred while reading the song format from the config file: "
+                    f"{e}. Falling back to the default format"
+                )
+
+                self.song_format = "{playstate} {title} - {artist} - {album}"
+
+    def config_changed(self, keys):
+        '''Apply the options changed in the config file'''
+        if 'song_format' in keys:
+            self.set_song_format(self.config.song_format)
+            self.song_changed()
+        if keys & {'run_on_song_change', 'hook_workers', 'hook_timeout'}:
+            self.hook_runner.configure(self.config.run_on_song_change, self.config.hook_workers, self.config.hook_timeout)
+        if 'plugins' in keys:
+            # The old plugins finish their queued callbacks on their own thread
+            self.plugins.close(wait=False)
+            self.plugins = PluginManager(self.config.plugins)
+        if 'volume_rate' in keys:
+            self.volume_control.set_rate(self.config.volume_rate)
+
     def startup(self):
-        '''Start timers, check playstate and song'''
-        # Check mpd status
-        if self.mpd_status.get("state") == "play":
+        '''Start the status watcher and timers'''
+        # MPD pushes every status change, nothing is polled
+        self.status_watcher.songChanged.connect(self.check_song_change)
+        self.status_watcher.statusChanged.connect(self.status_changed)
+        self.status_watcher.mixerChanged.connect(self.set_slider_value)
+        self.status_watcher.connectionChanged.connect(self.connection_changed)
+        self.mpd_manager.enqueuer.progress.connect(self.add_progress)
+        self.mpd_manager.enqueuer.finished.connect(self.add_finished)
+        self.status_watcher.start()
+        self.song_changed()
+        # The clock and the progress bar share one timer, stopped while the window can't be seen
+        self.scheduler.add("clock", 60, self.clock_update, slack=1.0, wall_clock=True)
+        self.scheduler.add("progress", 1, self.update_progress)
+        self.scheduler.set_active("progress", False)
+        self.scheduler.suspendedChanged.connect(self.song_display.set_suspended)
+        self.scheduler.watch(self)
+
+    def build_deferred(self):
+        '''Build the secondary windows one per event loop pass after the first paint, then load the library'''
+        if self.album_display is None:
+            self.album_window()
+            QTimer.singleShot(0, self.build_deferred)
+        elif self.song_picker_window is None:
+            self.song_picker()
+            self.song_picker_window.fetch_songs()
+
+    def album_window(self):
+        '''Return the album art window, building it the first time'''
+        if self.album_display is None:
+            self.album_display = AlbumCoverWindow(self.mpd_manager, self)
+            # The song may have changed before the window existed
+            if self.current_song_info:
+                self.album_display.update_album_art(self.current_song_info)
+        return self.album_display
+
+    def song_picker(self):
+        '''Return the song picker window, building it the first time'''
+        if self.song_picker_window is None:
+            self.song_picker_window = SongPickerWindow(
+                self.mpd_manager,
+                get_asset_cache().pixmap(self.theme_manager, "song_picker_background"),
+                self.spicker_stylesheet,
+                self.tbar_stylesheet,
+            )
+            self.song_picker_window.window_close.connect(self.song_changed)
+        return self.song_picker_window
+
+    def status_changed(self, status):
+        '''Update the playstate and progress with the status pushed by MPD'''
+        if status.get("state") != self.mpd_status.get("state"):
+            self.plugins.state_changed(status.get("state"), self.current_song_info)
+        self.mpd_status = status
+        self.playback_clock.update(status)
+        # The progress only moves while playing
+        self.scheduler.set_active("progress", status.get("state") == "play")
+        if status.get("state") == "play":
             # Set status and button to "play"
             self.toggle.setChecked(True)
             self.playstate = "Playing:"
-        elif self.mpd_status.get("state") == "pause":
+        elif status.get("state") == "pause":
             # Set status and button to "pause"
             self.toggle.setChecked(False)
             self.playstate = "Paused:"
         else:
+            self.toggle.setChecked(False)
             self.playstate = "Not Playing!"
-        # Start timers
         self.song_changed()
-        self.check_song_change_timer.start(1000)
-        self.scroll_timer.start(80)
-        self.progress_timer.start(1000)
-        self.update_clock_timer()
-        self.clock_timer.start()
-
-    def check_song_change(self):
-        '''Check if the current song changed'''
-        try:
-            # Check for song change
-            current_song = self.client.currentsong()
-            if current_song != self.previous_song:
-                # Update the current song info
-                self.previous_song = current_song
-                self.songChanged.emit()
-
-                # Try to run run_on_song_change command
-                self.run_user_command("song_change")
-
-                # Skip the first current song var update
-                if self.songs_played == 0:
-                    # If no song has played yet, increment the counter by 1
-                    self.songs_played += 1
-                else:
-                    # Update the song display
-                    self.song_changed()
-                    # Increment the songs played counter on every song change
-                    self.songs_played += 1
-
-        except Exception as e:
-            print("Connection error:", e)
-            self.close()
-
-    def run_user_command(self, cmd_arg):
-        '''Run a command specified in the config file for every song changed, re passing the passed arg'''
-        if self.user_command:
-            command = self.user_command + f" {cmd_arg}"
-            try:
-                global subprocess_instance
-                with subprocess.Popen(command.split()) as subprocess_instance:
-                    subprocess_instance.communicate()
-            except Exception as e:
-                print("An error occurred while running the custom command: ", e)
+        self.update_progress()
+
+    def check_song_change(self, current_song, status):
+        '''Handle a song change reported by MPD, along with the status it came with'''
+        # Update the current song info
+        self.current_song_info = current_song
+        self.songChanged.emit(current_song)
+
+        # Try to run run_on_song_change command, the status of the new song only follows this signal
+        self.run_user_command("song_change", status)
+        self.plugins.song_changed(current_song)
+
+        # Update the song display
+        self.song_changed()
+        # Increment the songs played counter on every song change
+        self.songs_played += 1
+
+    def run_user_command(self, cmd_arg, status=None):
+        '''Run the command specified in the config file in the background, passing the event and the song'''
+        self.hook_runner.run(cmd_arg, self.current_song_info, self.mpd_status if status is None else status)
 
     def get_current_song_info(self):
-        '''Get all info from the current song'''
-        try:
-            status = self.client.status()
-            if status.get("state") == "stop":
-                # Set the current song variable
-                self.current_song = "Not Playing!"
-            else:
-                # Fetch MPD's current song info
-                current_song_info = self.client.currentsong()
-
-                # Set the current song variable
-                self.current_song_title = current_song_info.get("title")
-                self.current_artist = current_song_info.get("artist")
-                self.current_album = current_song_info.get("album")
-
-                # Use current_song_format to construct current_song string
-                self.current_song = self.song_format.format(
-                    playstate=self.playstate,
-                    title=self.current_song_title,
-                    artist=self.current_artist,
-                    album=self.current_album,
-                )
+        '''Format the current song's info'''
+        if self.mpd_status.get("state") == "stop":
+            # Set the current song variable
+            self.current_song = "Not Playing!"
+        else:
+            # Set the current song variable
+            self.current_song_title = self.current_song_info.get("title")
+            self.current_artist = self.current_song_info.get("artist")
+            self.current_album = self.current_song_info.get("album")
+
+            # Use current_song_format to construct current_song string
+            self.current_song = self.song_format.format(
+                playstate=self.playstate,
+                title=self.current_song_title,
+                artist=self.current_artist,
+                album=self.current_album,
+            )
+
+        # Return the current song variable
+        return self.current_song
+
+    def connection_changed(self, connected):
+        '''Show that MPD can't be reached, the status watcher keeps reconnecting'''
+        self.connected = connected
+        if not connected:
+            self.mpd_status = {}
+            self.playback_clock.update(self.mpd_status)
+            self.scheduler.set_active("progress", False)
+            self.song_changed()
+            self.update_progress()
 
-            # Return the current song variable
-            return self.current_song
-        except Exception as e:
-            print(f"An error occurred while getting current song info: {e}")
-            return None
+    def add_progress(self, done, total):
+        '''Show how many songs have been added to the queue'''
+        self.adding = (done, total)
+        self.song_changed()
+
+    def add_finished(self, added, failures): # pylint: disable=unused-argument
+        '''Report the songs MPD couldn't add and show the current song again'''
+        for uri, error in failures:
+            print(f"An error occurred while adding {uri}: {error}")
+        self.adding = None
+        self.song_changed()
 
     def song_changed(self):
         '''Update the screen with the new song's info'''
         state = self.mpd_status.get("state")
-        if state in ["play", "pause", "stop"]:
-            self.current_song = self.get_current_song_info()
-            self.song_display.setText(self.current_song)
-            self.song_display.setCursorPosition(0)
+        if not self.connected:
+            current_song = "Connecting to MPD..."
+        elif self.adding:
+            current_song = f"Adding songs... {self.adding[0]}/{self.adding[1]}"
+        elif state in ["play", "pause", "stop"]:
+            current_song = self.get_current_song_info()
         else:
-            self.current_song = "Not Playing!"
+            current_song = "Not Playing!"
+        # Status changes that don't touch the text shouldn't restart the scrolling
+        if current_song != self.song_display.text():
+            self.current_song = current_song
             self.song_display.setText(self.current_song)
-            self.song_display.setCursorPosition(0)
 
-    def get_slider_value(self):
+    def set_slider_value(self, volume):
         '''Set the slider position to the volume reported by mpd'''
-        try:
-            if self.mpd_status.get("state") != "stop":
-                slider_value = int(self.client.status()["volume"])
-            else:
-                slider_value = 50
-        except Exception:
-            slider_value = 50
-        return slider_value
+        # MPD reports -1 when there's no mixer
+        if volume < 0:
+            return
+        self.plugins.volume_changed(volume, self.current_song_info)
+        # The event is older than the changes still being sent
+        if self.volume_slider.isSliderDown() or self.volume_control.busy():
+            return
+        self.slider_volume = volume
+        # Don't send the value we just received back to MPD
+        self.volume_slider.blockSignals(True)
+        self.volume_slider.setValue(volume)
+        self.volume_slider.blockSignals(False)
 
     def volume_changed(self, value):
         '''Change the mpd volume on slider update'''
-        try:
-            self.client.setvol(value)
-        except Exception as e:
-            print(f"An error occurred while setting the volume: {e}")
+        delta = value - self.slider_volume
+        self.slider_volume = value
+        if self.volume_slider.isSliderDown():
+            self.volume_control.set_volume(value)
+        else:
+            self.volume_control.change_volume(delta, value)
 
     def update_progress(self):
         '''Updates the progress bar'''
-        status = self.client.status()
-        if "time" in status:
-            current_time, total_time = map(int, status["time"].split(":"))
+        # Interpolated locally between MPD events
+        current_time, total_time = self.playback_clock.position()
+        if total_time:
             progress = int((current_time / total_time) * 100)
             self.progress_bar.setValue(progress)
             self.progress_bar.setFormat(
-                f"{strftime(
-                    '%M:%S', localtime(current_time))} / {strftime('%M:%S', localtime(total_time)
-                    )}"
+                f"{strftime('%M:%S', localtime(current_time))} / {strftime('%M:%S', localtime(total_time))}"
                 )
         else:
             self.progress_bar.setValue(0)
 
-    def scroll_text(self):
-        '''Scroll the text inside the song display'''
-        try:
-            cursor_position = self.song_display.cursorPosition()
-            if cursor_position == len(self.current_song):
-                if not self.delay_active:
-                    self.delay_active = True
-                    QTimer.singleShot(3000, self.reset_cursor)
-            else:
-                self.song_display.setCursorPosition(cursor_position + 1)
-        except Exception as e:
-            print("There was an error scrolling the text: ", e)
-
-    def reset_cursor(self):
-        '''Set the cursor to the start of the line in the song display'''
-        self.delay_active = False
-        self.song_display.setCursorPosition(0)
-
     # Buttons
     def on_play_toggle(self, checked):
         '''Update display and mpd playstate'''
         if checked:
             self.playstate = "Playing:"
-            self.client.play()
+            self.mpd_manager.submit("play")
             self.song_changed()
             self.run_user_command("resumed")
         else:
             self.playstate = "Paused:"
-            self.client.pause()
+            self.mpd_manager.submit("pause")
             self.song_changed()
             self.run_user_command("paused")
 
     def on_next_press(self):
         '''Skip current song and update display'''
-        try:
-            self.client.next()
-            # Set the playstate and button to "play"
-            if self.mpd_status.get("state") != "play":
-                self.toggle.setChecked(True)
-                self.playstate = "Playing:"
-        except Exception as e:
-            print("An error occurred while executing next song command:", e)
+        self.mpd_manager.submit(
+            "next",
+            errback=lambda e: print("An error occurred while executing next song command:", e)
+        )
+        # Set the playstate and button to "play"
+        if self.mpd_status.get("state") != "play":
+            self.toggle.setChecked(True)
+            self.playstate = "Playing:"
 
     def on_prev_press(self):
         '''Rewind or go back a song and update display'''
-        try:
-            self.client.previous()
-            # Set the playstate and play button to "play"
-            if self.mpd_status.get("state") != "play":
-                self.toggle.setChecked(True)
-                self.playstate = "Playing:"
-        except Exception as e:
-            print("An error occurred while executing previous song command:", e)
+        self.mpd_manager.submit(
+            "previous",
+            errback=lambda e: print("An error occurred while executing previous song command:", e)
+        )
+        # Set the playstate and play button to "play"
+        if self.mpd_status.get("state") != "play":
+            self.toggle.setChecked(True)
+            self.playstate = "Playing:"
 
     def on_stop_press(self):
         '''Stop music and update display'''
-        self.client.stop()
+        self.mpd_manager.submit("stop")
         self.song_display.setText("Not Playing!")
         self.toggle.setChecked(False)
         self.run_user_command("stopped")
 
     def closeEvent(self, event): # pylint: disable=invalid-name,unused-argument
         ''''Exit pyamp gracefully'''
-        # Close custom command ran by user if it is still open
-        if self.user_command:
-            if subprocess_instance and subprocess_instance.poll() is None:
-                subprocess_instance.terminate()
+        # Kill the custom commands still running
+        self.hook_runner.close()
+        self.plugins.close()
         # Print the number of songs played
         print("Songs played:", self.songs_played)
-        # Close mpd connection
-        self.client.disconnect()
         # Stop timers
-        self.progress_timer.stop()
-        self.scroll_timer.stop()
-        self.clock_timer.stop()
-        self.check_song_change_timer.stop()
+        self.scheduler.stop()
+        # Stop loading the library and the search thread
+        if self.song_picker_window is not None:
+            self.song_picker_window.cancel_fetch()
+            self.song_picker_window.search_worker.stop()
+        # Stop resolving album art
+        if self.album_display is not None:
+            self.album_display.shutdown()
+        # Close mpd connections
+        self.mpd_manager.close()
+        reports = [
+            # How long MPD took to answer each command
+            self.mpd_manager.latency_report(),
+            # How often the window woke up to update itself
+            self.scheduler.report(),
+            # How long the custom commands and the plugins took
+            self.hook_runner.report(),
+            self.plugins.report(),
+        ]
+        # How each album art source performed
+        if self.album_display is not None:
+            reports.append(self.album_display.art_pipeline.report())
+        # Reports with nothing to say aren't printed
+        for report in reports:
+            if report:
+                print(report)
         # Quit qt
         qApp.quit()  # pylint: disable=undefined-variable
 
     def open_song_picker(self):
         '''Open song picker window'''
-        self.song_picker_window.clear_selection()
-        self.song_picker_window.show()
-        self.song_picker_window.window_close.connect(self.song_changed)
-
-    def update_clock_timer(self):
-        '''Calculate the time till the next clock update'''
-        # Get the current time
-        current_time = localtime()
-        # Calculate remaining seconds until next minute
-        remaining_seconds = 60 - current_time.tm_sec
-        self.clock_timer.setInterval(remaining_seconds * 1000)
+        song_picker = self.song_picker()
+        song_picker.clear_selection()
+        song_picker.show()
 
     def clock_update(self):
         '''Update the clock'''
@@ -526,3 +586,7 @@ class MainWindow(QMainWindow):
         '''Draw the window with a background image'''
         painter = QPainter(self)
         painter.drawPixmap(self.rect(), self.background_image)
+        if self.startup_clock.painted():
+            print(self.startup_clock.report())
+            # What the first paint didn't need is built once the event loop is idle
+            QTimer.singleShot(0, self.build_deferred)
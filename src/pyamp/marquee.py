@@ -0,0 +1,147 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from PySide6.QtWidgets import QStyle, QStyleOptionFrame
+from PySide6.QtGui import QPainter, QPalette, QPixmap
+from PySide6.QtCore import Qt, QEvent, QTimer
+from pyamp.ui import NonSelectableLineEdit
+
+
+class Marquee(NonSelectableLineEdit):
+    '''Scrolling text box, the text is drawn once to a pixmap that is moved a few pixels at a time'''
+    # Pixels moved every STEP milliseconds, 50 pixels a second
+    PIXELS = 2
+    STEP = 40
+    # Milliseconds the text stays still at the start and at the end
+    HOLD_START = 2000
+    HOLD_END = 3000
+    # Space between the frame and the text, like QLineEdit
+    MARGIN = 2
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setReadOnly(True)
+        self.setFocusPolicy(Qt.NoFocus)
+        # Kept out of QLineEdit, which would lay the text out again on every change
+        self.marquee_text = ""
+        self.pixmap = None
+        self.offset = 0
+        # Pixels the text is wider than the box, 0 when it fits
+        self.overflow = 0
+        # Set while the window is covered, which doesn't hide the widget
+        self.suspended = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.step)
+        # Timer ticks and painted frames, for the benchmark
+        self.steps = 0
+        self.frames = 0
+
+    def text(self):
+        '''Return the displayed text'''
+        return self.marquee_text
+
+    def setText(self, text): # pylint: disable=invalid-name
+        '''Show a new text from its start'''
+        if text == self.marquee_text:
+            return
+        self.marquee_text = text
+        self.render_text()
+
+    def render_text(self):
+        '''Draw the text to the cached pixmap and scroll it from the start'''
+        metrics = self.fontMetrics()
+        ratio = self.devicePixelRatioF()
+        width = max(1, metrics.horizontalAdvance(self.marquee_text))
+        self.pixmap = QPixmap(round(width * ratio), round(metrics.height() * ratio))
+        self.pixmap.setDevicePixelRatio(ratio)
+        self.pixmap.fill(Qt.transparent)
+        painter = QPainter(self.pixmap)
+        painter.setFont(self.font())
+        painter.setPen(self.palette().color(QPalette.Text))
+        painter.drawText(0, metrics.ascent(), self.marquee_text)
+        painter.end()
+        self.offset = 0
+        self.update_overflow()
+        self.update()
+
+    def text_rect(self):
+        '''Return the area inside the frame where the text is drawn'''
+        option = QStyleOptionFrame()
+        self.initStyleOption(option)
+        rect = self.style().subElementRect(QStyle.SE_LineEditContents, option, self)
+        return rect.adjusted(self.MARGIN, 0, -self.MARGIN, 0)
+
+    def update_overflow(self):
+        '''Scroll only when the text doesn't fit and the box is shown'''
+        text_width = self.pixmap.width() / self.pixmap.devicePixelRatio() if self.pixmap else 0
+        self.overflow = max(0, int(text_width) - self.text_rect().width())
+        self.offset = min(self.offset, self.overflow)
+        if self.overflow and self.isVisible() and not self.suspended:
+            if not self.timer.isActive():
+                self.timer.start(self.HOLD_START if self.offset == 0 else self.STEP)
+        else:
+            self.timer.stop()
+
+    def set_suspended(self, suspended):
+        '''Stop or resume scrolling, e.g. while the window can't be seen'''
+        self.suspended = suspended
+        self.update_overflow()
+
+    def step(self):
+        '''Move the text, or back to the start once it has been held at the end'''
+        self.steps += 1
+        if self.offset >= self.overflow:
+            self.offset = 0
+            self.timer.start(self.HOLD_START)
+        else:
+            self.offset = min(self.overflow, self.offset + self.PIXELS)
+            self.timer.start(self.HOLD_END if self.offset >= self.overflow else self.STEP)
+        self.update(self.text_rect())
+
+    def paintEvent(self, event): # pylint: disable=invalid-name,unused-argument
+        '''Draw the themed frame and the visible part of the text'''
+        self.frames += 1
+        painter = QPainter(self)
+        option = QStyleOptionFrame()
+        self.initStyleOption(option)
+        self.style().drawPrimitive(QStyle.PE_PanelLineEdit, option, painter, self)
+        if self.pixmap is None:
+            return
+        rect = self.text_rect()
+        painter.setClipRect(rect)
+        height = self.pixmap.height() / self.pixmap.devicePixelRatio()
+        painter.drawPixmap(rect.x() - self.offset, int(rect.y() + (rect.height() - height) / 2), self.pixmap)
+
+    def changeEvent(self, event): # pylint: disable=invalid-name
+        '''Draw the text again when the theme or the font changes'''
+        super().changeEvent(event)
+        if event.type() in (QEvent.FontChange, QEvent.PaletteChange, QEvent.StyleChange):
+            self.render_text()
+
+    def resizeEvent(self, event): # pylint: disable=invalid-name
+        '''The text may fit, or stop fitting, at the new size'''
+        super().resizeEvent(event)
+        self.update_overflow()
+
+    def showEvent(self, event): # pylint: disable=invalid-name
+        '''Start scrolling when the window is shown or restored'''
+        super().showEvent(event)
+        self.update_overflow()
+
+    def hideEvent(self, event): # pylint: disable=invalid-name
+        '''Stop scrolling while the window is hidden or minimized'''
+        super().hideEvent(event)
+        self.timer.stop()
@@ -0,0 +1,83 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import sys
+from time import process_time
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QEventLoop, QTimer
+from pyamp.ui import NonSelectableLineEdit
+from pyamp.marquee import Marquee
+
+
+class CursorTicker(NonSelectableLineEdit):
+    '''The old song display, moving the cursor every 80ms, kept for the benchmark'''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setReadOnly(True)
+        self.steps = 0
+        self.frames = 0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.step)
+        self.timer.start(80)
+
+    def step(self):
+        '''Move the cursor a character, back to the start at the end'''
+        self.steps += 1
+        position = self.cursorPosition()
+        self.setCursorPosition(0 if position == len(self.text()) else position + 1)
+
+    def paintEvent(self, event): # pylint: disable=invalid-name
+        '''Count the painted frames'''
+        self.frames += 1
+        super().paintEvent(event)
+
+
+def main():
+    '''Compare the CPU time and repaints of both song displays, "python -m pyamp.marquee_benchmark [seconds]"'''
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    app = QApplication.instance() or QApplication(sys.argv)
+    stylesheet = "QLineEdit { border: 1px solid dodgerblue; background-color: black; padding: 2px; color: dodgerblue; }"
+    texts = {
+        "fits": "Playing: Song",
+        "overflows": "Playing: A Rather Long Song Title - Some Artist With A Long Name - An Album Nobody Can Fit",
+    }
+    for label, text in texts.items():
+        for visible in (True, False):
+            for widget_class in (CursorTicker, Marquee):
+                widget = widget_class()
+                widget.setStyleSheet(stylesheet)
+                widget.setFixedSize(260, 30)
+                widget.setText(text)
+                if visible:
+                    widget.show()
+                    app.processEvents()
+                widget.frames = widget.steps = 0
+                loop = QEventLoop()
+                QTimer.singleShot(int(seconds * 1000), loop.quit)
+                cpu_start = process_time()
+                loop.exec()
+                cpu = process_time() - cpu_start
+                print(
+                    f"{widget_class.__name__:>12}, {label:>9}, {'shown' if visible else 'hidden':>6}: "
+                    f"{widget.steps / seconds:5.1f} wakeups/s, {widget.frames / seconds:5.1f} frames/s, "
+                    f"{cpu / seconds * 100:.2f}% CPU"
+                )
+                widget.close()
+                widget.deleteLater()
+                app.processEvents()
+
+
+if __name__ == "__main__":
+    main()
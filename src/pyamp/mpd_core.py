@@ -13,30 +13,269 @@
 #
 #    You should have received a copy of the GNU General Public License
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
-import sys
-from mpd import MPDClient
-from pyamp.config import ConfigManager
+import queue
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import Future
+from time import perf_counter
+from PySide6.QtCore import QObject, QThread, Signal
+from mpd import CommandError
+from pyamp.config import get_config
+from pyamp.status import StatusWatcher
+from pyamp.connection import MPDConnection
+
+
+class LatencyHistogram:
+    '''Count command latencies in power of two millisecond buckets'''
+    BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.total = 0.0
+        self.worst = 0.0
+
+    def record(self, seconds):
+        '''Add a latency, in seconds, to the histogram'''
+        milliseconds = seconds * 1000
+        self.counts[bisect_left(self.BUCKETS, milliseconds)] += 1
+        self.total += milliseconds
+        self.worst = max(self.worst, milliseconds)
+
+    def summary(self):
+        '''Return the histogram as a single line'''
+        count = sum(self.counts)
+        buckets = []
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count:
+                label = f"<{self.BUCKETS[index]}ms" if index < len(self.BUCKETS) else f">={self.BUCKETS[-1]}ms"
+                buckets.append(f"{label}: {bucket_count}")
+        return f"n={count} avg={self.total / count:.1f}ms max={self.worst:.1f}ms [{', '.join(buckets)}]"
+
+
+# Commands that can safely be sent again if the connection drops before MPD answers
+REPEATABLE_COMMANDS = frozenset((
+    "status", "currentsong", "stats", "ping", "playlistinfo", "playlistid", "plchangesposid",
+    "albumart", "readpicture", "lsinfo", "listallinfo",
+    "play", "stop", "setvol", "random", "repeat", "single", "consume",
+))
+
+
+def repeatable(function):
+    '''Mark a function submitted to the worker as safe to call again after a lost connection'''
+    function.repeatable = True
+    return function
+
+
+class MPDRequest:
+    '''A queued MPD command and the callbacks its result is delivered to'''
+    def __init__(self, command, args, callback, errback):
+        self.command = command
+        self.args = args
+        self.callback = callback
+        self.errback = errback
+        self.future = Future()
+
+    @property
+    def repeatable(self):
+        '''Return whether the request may be sent again if the connection drops, commands changing the queue aren't'''
+        if isinstance(self.command, str):
+            return self.command in REPEATABLE_COMMANDS
+        return getattr(self.command, "repeatable", False)
+
+    @property
+    def name(self):
+        '''Name used for the latency histogram'''
+        return self.command if isinstance(self.command, str) else self.command.__name__
+
+
+class MPDWorker(QThread):
+    '''Run MPD commands from a queue on a thread owning the connection'''
+    requestDone = Signal(object)
+
+    def __init__(self, connection):
+        super().__init__()
+        # Connected, and reconnected, on the worker thread
+        self.connection = connection
+        self.queue = queue.Queue()
+        self.latency = {}
+        # Queued back to the GUI thread, where the callbacks run
+        self.requestDone.connect(self.deliver)
+
+    def submit(self, command, *args, callback=None, errback=None):
+        '''Queue a command name, or a function taking the client, and return its future'''
+        request = MPDRequest(command, args, callback, errback)
+        self.queue.put(request)
+        return request.future
+
+    def run(self):
+        '''Execute queued requests until stop() is called'''
+        while True:
+            try:
+                request = self.queue.get(timeout=self.connection.HEALTH_INTERVAL)
+            except queue.Empty:
+                # Keep the connection alive, or find out it's dead, while nothing is sent
+                self.connection.check()
+                continue
+            if request is None:
+                break
+            start = perf_counter()
+            try:
+                if isinstance(request.command, str):
+                    result = self.connection.run(self.call, request, retry=request.repeatable)
+                else:
+                    result = self.connection.run(request.command, *request.args, retry=request.repeatable)
+                request.future.set_result(result)
+            except Exception as e:
+                request.future.set_exception(e)
+            self.latency.setdefault(request.name, LatencyHistogram()).record(perf_counter() - start)
+            self.requestDone.emit(request)
+        self.connection.drop()
+
+    @staticmethod
+    def call(client, request):
+        '''Send a command given by name'''
+        return getattr(client, request.command)(*request.args)
+
+    def deliver(self, request):
+        '''Hand the result of a request to its callbacks'''
+        error = request.future.exception()
+        if error is None:
+            if request.callback:
+                request.callback(request.future.result())
+        elif request.errback:
+            request.errback(error)
+        else:
+            print(f"An error occurred while running {request.name}: {error}")
+
+    def stop(self):
+        '''Finish the queued requests and wait for the thread to exit'''
+        self.queue.put(None)
+        # Requests queued while MPD is unreachable fail instead of waiting for it
+        self.connection.closed.set()
+        self.wait()
+
+
+def run_command_list(client, commands):
+    '''Send (command, args) pairs in one command list, return the (argument, error) of those MPD rejected'''
+    failures = []
+    while commands:
+        client.command_list_ok_begin()
+        for command, args in commands:
+            getattr(client, command)(*args)
+        try:
+            client.command_list_end()
+            break
+        except CommandError as e:
+            if e.offset is None:
+                raise
+            # MPD stops at the failing command, the ones before it were run, the rest is sent again
+            command, args = commands[e.offset]
+            failures.append((args[0] if args else command, e.msg))
+            commands = commands[e.offset + 1:]
+    return failures
+
+
+class Enqueuer(QObject):
+    '''Add songs to the queue in command lists, one round trip per batch instead of per song'''
+    # Commands sent so far and in total
+    progress = Signal(int, int)
+    # Commands sent and the (argument, error) pairs of those MPD rejected
+    finished = Signal(int, object)
+
+    def __init__(self, worker, batch_size=500):
+        super().__init__()
+        self.worker = worker
+        self.batch_size = max(1, batch_size)
+        # (command, args) pairs not sent yet
+        self.pending = deque()
+        self.running = False
+        self.done = 0
+        self.total = 0
+        self.failures = []
+
+    def add_uris(self, uris):
+        '''Add songs or whole directories, in order'''
+        self.queue_commands(("add", (uri,)) for uri in uris)
+
+    def search_add(self, *args):
+        '''Add every song whose tags contain the given values, ignoring case'''
+        self.queue_commands([("searchadd", args)])
+
+    def queue_commands(self, commands):
+        '''Queue commands behind the ones not sent yet'''
+        count = len(self.pending)
+        self.pending.extend(commands)
+        self.total += len(self.pending) - count
+        self.progress.emit(self.done, self.total)
+        if not self.running:
+            self.send_batch()
+
+    def send_batch(self):
+        '''Send the next batch, the worker runs other commands between batches'''
+        if not self.pending:
+            self.running = False
+            self.finished.emit(self.done, self.failures)
+            self.done = self.total = 0
+            self.failures = []
+            return
+        self.running = True
+        batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+        self.worker.submit(
+            run_command_list, batch,
+            callback=lambda failures: self.batch_done(batch, failures),
+            errback=lambda e: self.batch_done(batch, [(args[0] if args else command, str(e)) for command, args in batch])
+        )
+
+    def batch_done(self, batch, failures):
+        '''Count a batch, then send the next one'''
+        self.done += len(batch)
+        self.failures.extend(failures)
+        self.progress.emit(self.done, self.total)
+        self.send_batch()
 
 
 class MPDManager:
-    '''Creates the MPD client'''
+    '''Creates the MPD connections and the command worker'''
     def __init__(self):
 
         # Load config
-        self.config_manager = ConfigManager()
-        self.config_data = self.config_manager.load_config()
+        self.config = get_config()
         # Set host and port from config
-        self.host = self.config_data.get('host')
-        self.port = self.config_data.get('port')
+        self.host = self.config.host
+        self.port = self.config.port
+        # Socket timeout for every command, idle waits for as long as it takes
+        self.timeout = self.config.timeout
 
-        # Open client
-        self.client = MPDClient()
-        try:
-            self.client.connect(self.host, self.port)
-        except Exception as e:
-            print(f"Error connecting to MPD: {e}")
-            sys.exit()
-
-    def get_client(self):
-        '''Return the MPD client'''
-        return self.client
+        # Transport commands, never held up by library loads or album art transfers
+        self.worker = MPDWorker(self.connection("command"))
+        self.worker.start()
+        # Large additions to the queue are sent in batches between the other commands
+        self.enqueuer = Enqueuer(self.worker, self.config.add_batch_size)
+        self.config.changed.connect(self.config_changed)
+
+        # Dedicated idle connection pushing status changes
+        self.status_watcher = StatusWatcher(self.connection("idle"))
+
+    def config_changed(self, keys):
+        '''Apply the batch size saved in the config file, the connections keep their settings until a restart'''
+        if 'add_batch_size' in keys:
+            self.enqueuer.batch_size = max(1, self.config.add_batch_size)
+
+    def connection(self, name):
+        '''Return a new connection to the configured server, it connects when first used'''
+        return MPDConnection(self.host, self.port, self.timeout, name)
+
+    def submit(self, command, *args, callback=None, errback=None):
+        '''Run a command on the worker thread, the callbacks are called on the GUI thread'''
+        return self.worker.submit(command, *args, callback=callback, errback=errback)
+
+    def latency_report(self):
+        '''Return the latency histogram of every command sent to MPD'''
+        return "\n".join(
+            f"{name}: {histogram.summary()}" for name, histogram in sorted(self.worker.latency.items())
+        )
+
+    def close(self):
+        '''Stop the threads, which close their connections'''
+        self.status_watcher.stop()
+        self.worker.stop()
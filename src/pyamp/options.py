@@ -13,7 +13,6 @@
 #
 #    You should have received a copy of the GNU General Public License
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
-import base64
 from PySide6.QtWidgets import (
     QMainWindow,
     QWidget,
@@ -22,14 +21,14 @@ from PySide6.QtWidgets import (
     QLabel,
     QVBoxLayout
 )
-from PySide6.QtGui import QPixmap, QPainter
+from PySide6.QtGui import QPainter
 from PySide6.QtCore import Qt
 
 
 class OptionsWindow(QMainWindow):
     '''Window exposing MPD's playback options'''
 
-    def __init__(self, mpd_manager, img_op_background, options_stylesheet):
+    def __init__(self, mpd_manager, options_background, options_stylesheet):
         super().__init__()
 
         # Window title and geometry
@@ -49,24 +48,17 @@ class OptionsWindow(QMainWindow):
         self.layout.setAlignment(Qt.AlignCenter)
 
 
-        # Window background and alpha channel
-        # Decode the base64 image data
-        background_data = base64.b64decode(img_op_background)
-
-        # Create a QPixmap from the binary data
-        background_pixmap = QPixmap()
-        background_pixmap.loadFromData(background_data)
-
         # Set the background image and mask
-        self.background_image = background_pixmap
+        # The pixmap is shared with the other windows through the asset cache
+        self.background_image = options_background
         self.setMask(self.background_image.mask())
 
         # Stylesheet
         self.stylesheet = options_stylesheet
 
         # MPD Stuff
-        self.client = mpd_manager.get_client()
-        self.client_status = self.client.status()
+        self.mpd_manager = mpd_manager
+        self.client_status = mpd_manager.status_watcher.status
 
         # Window Label
         label = QLabel("Playback Options")
@@ -85,8 +77,8 @@ class OptionsWindow(QMainWindow):
         self.rnd_button.setFixedHeight(25)
         self.rnd_button.setFixedWidth(100)
         self.rnd_button.setCheckable(True)
-        self.rnd_button.clicked.connect(lambda: self.button_action(self.client.random, self.rnd_button, "random", "toggle"))
-        self.button_action(self.client.random, self.rnd_button, "random", "check")
+        self.rnd_button.clicked.connect(lambda: self.button_action("random", self.rnd_button, "random", "toggle"))
+        self.button_action("random", self.rnd_button, "random", "check")
         self.rnd_button.setStyleSheet(self.stylesheet)
 
         self.consume_button = QPushButton("Consume")
@@ -94,8 +86,8 @@ class OptionsWindow(QMainWindow):
         self.consume_button.setFixedHeight(25)
         self.consume_button.setFixedWidth(100)
         self.consume_button.setCheckable(True)
-        self.consume_button.clicked.connect(lambda: self.button_action(self.client.consume, self.consume_button, "Consume", "toggle"))
-        self.button_action(self.client.consume, self.consume_button, "consume", "check")
+        self.consume_button.clicked.connect(lambda: self.button_action("consume", self.consume_button, "Consume", "toggle"))
+        self.button_action("consume", self.consume_button, "consume", "check")
         self.consume_button.setStyleSheet(self.stylesheet)
 
         self.single_button = QPushButton("Single")
@@ -103,8 +95,8 @@ class OptionsWindow(QMainWindow):
         self.single_button.setFixedHeight(25)
         self.single_button.setFixedWidth(100)
         self.single_button.setCheckable(True)
-        self.single_button.clicked.connect(lambda: self.button_action(self.client.single, self.single_button, "Single", "toggle"))
-        self.button_action(self.client.single, self.single_button, "single", "check")
+        self.single_button.clicked.connect(lambda: self.button_action("single", self.single_button, "Single", "toggle"))
+        self.button_action("single", self.single_button, "single", "check")
         self.single_button.setStyleSheet(self.stylesheet)
 
         self.rpt_button = QPushButton("Repeat")
@@ -112,12 +104,23 @@ class OptionsWindow(QMainWindow):
         self.rpt_button.setFixedHeight(25)
         self.rpt_button.setFixedWidth(100)
         self.rpt_button.setCheckable(True)
-        self.rpt_button.clicked.connect(lambda: self.button_action(self.client.repeat, self.rpt_button, "Repeat", "toggle"))
-        self.button_action(self.client.repeat, self.rpt_button, "repeat", "check")
+        self.rpt_button.clicked.connect(lambda: self.button_action("repeat", self.rpt_button, "Repeat", "toggle"))
+        self.button_action("repeat", self.rpt_button, "repeat", "check")
         self.rpt_button.setStyleSheet(self.stylesheet)
 
+        # Keep the buttons in sync with changes made by other clients
+        mpd_manager.status_watcher.optionsChanged.connect(self.sync_options)
+
         self.installEventFilter(self)
 
+    def sync_options(self, status):
+        '''Update every button with the options pushed by MPD'''
+        self.client_status = status
+        self.button_action("random", self.rnd_button, "random", "check")
+        self.button_action("consume", self.consume_button, "consume", "check")
+        self.button_action("single", self.single_button, "single", "check")
+        self.button_action("repeat", self.rpt_button, "repeat", "check")
+
     def button_action(self, command, button, text, mode):
         '''Toggle the option based on the given mode, updates the text for the given button'''
         if mode == "check":
@@ -132,11 +135,11 @@ class OptionsWindow(QMainWindow):
                 button.setText(f"{label} OFF")
         elif mode == "toggle":
             if button.isChecked():
-                command(1)
+                self.mpd_manager.submit(command, 1)
                 label = text[0].upper() + text[1:]
                 button.setText(f"{label} ON")
             else:
-                command(0)
+                self.mpd_manager.submit(command, 0)
                 label = text[0].upper() + text[1:]
                 button.setText(f"{label} OFF")
         else:
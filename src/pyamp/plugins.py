@@ -0,0 +1,102 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import inspect
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from pyamp.mpd_core import LatencyHistogram
+
+# Entry point group installed packages register their plugins in
+ENTRY_POINT_GROUP = "pyamp.plugins"
+# Callbacks a plugin may define, any of them can be left out
+CALLBACKS = ("on_song_change", "on_state_change", "on_volume_change")
+
+
+def load_plugin(name):
+    '''Return the plugin registered under an entry point name, or found at "module" or "module:attribute"'''
+    # Slow to import, and only needed when plugins are configured
+    from importlib.metadata import entry_points # pylint: disable=import-outside-toplevel
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        if entry_point.name == name:
+            plugin = entry_point.load()
+            break
+    else:
+        module_name, _, attribute = name.partition(":")
+        plugin = importlib.import_module(module_name)
+        for part in filter(None, attribute.split(".")):
+            plugin = getattr(plugin, part)
+    # Classes are instantiated, modules and objects are used as they are
+    return plugin() if inspect.isclass(plugin) else plugin
+
+
+class PluginManager:
+    '''Call the plugins' callbacks in order on a worker thread, the GUI never waits for them'''
+    def __init__(self, names):
+        self.plugins = []
+        for name in names or []:
+            try:
+                plugin = load_plugin(name)
+            except Exception as e:
+                print(f"An error occurred while loading the plugin {name}: ", e)
+                continue
+            if not any(hasattr(plugin, callback) for callback in CALLBACKS):
+                print(f"The plugin {name} has none of the callbacks: {', '.join(CALLBACKS)}")
+                continue
+            self.plugins.append((name, plugin))
+        # A single thread, so every plugin sees the events in the order they happened
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pyamp-plugins") if self.plugins else None
+        self.latency = {}
+
+    def song_changed(self, song):
+        '''Call on_song_change(song)'''
+        self.dispatch("on_song_change", dict(song))
+
+    def state_changed(self, state, song):
+        '''Call on_state_change(state, song), state being "play", "pause" or "stop"'''
+        self.dispatch("on_state_change", state, dict(song))
+
+    def volume_changed(self, volume, song):
+        '''Call on_volume_change(volume, song)'''
+        self.dispatch("on_volume_change", volume, dict(song))
+
+    def dispatch(self, callback, *args):
+        '''Queue a callback for every plugin defining it'''
+        if self.executor is not None:
+            self.executor.submit(self.call, callback, args)
+
+    def call(self, callback, args):
+        '''Run a callback on every plugin, on the worker thread'''
+        for name, plugin in self.plugins:
+            function = getattr(plugin, callback, None)
+            if function is None:
+                continue
+            start = perf_counter()
+            try:
+                function(*args)
+            except Exception as e:
+                print(f"An error occurred in {callback} of the plugin {name}: ", e)
+            self.latency.setdefault(name, LatencyHistogram()).record(perf_counter() - start)
+
+    def report(self):
+        '''Return how long each plugin's callbacks took'''
+        return "\n".join(f"Plugin {name}: {histogram.summary()}" for name, histogram in self.latency.items())
+
+    def close(self, wait=True):
+        '''Run the queued callbacks, then stop the worker, without waiting for it unless wait is set'''
+        executor, self.executor = self.executor, None
+        if executor is not None:
+            # Events coming in while the window closes are dropped by dispatch()
+            executor.shutdown(wait=wait)
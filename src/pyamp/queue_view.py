@@ -0,0 +1,423 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import posixpath
+from PySide6.QtWidgets import (
+    QMainWindow,
+    QWidget,
+    QPushButton,
+    QHBoxLayout,
+    QVBoxLayout,
+    QListView,
+    QAbstractItemView
+)
+from PySide6.QtGui import QPainter, QFont
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex
+from pyamp.ui import createTitleBar
+from pyamp.library import tag_value
+from pyamp.mpd_core import repeatable, run_command_list
+
+
+@repeatable
+def queue_changes(client, version):
+    '''Return the positions changed since a queue version, and the status they belong to'''
+    # A command list runs at once, the changes and the status always match
+    client.command_list_ok_begin()
+    client.plchangesposid(version)
+    client.status()
+    changes, status = client.command_list_end()
+    return changes, status
+
+
+def merge_ranges(ranges):
+    '''Sort (start, end) ranges and merge the ones that overlap or touch, dropping the empty ones'''
+    merged = []
+    for start, end in sorted(ranges):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def delete_commands(ranges):
+    '''Return the commands deleting the ranges, last one first so the other positions don't shift'''
+    return [("delete", (f"{start}:{end}",)) for start, end in reversed(merge_ranges(ranges))]
+
+
+def move_commands(ranges, to):
+    '''Return the commands moving the ranges, in order, to a single block starting at position to'''
+    before, after = [], []
+    for start, end in merge_ranges(ranges):
+        # A range spanning the target is split around it
+        if start < to:
+            before.append((start, min(end, to)))
+        if end > to:
+            after.append((max(start, to), end))
+    commands = []
+    # Ranges above the block are moved down to it, the closest first, the ones further up don't shift
+    block_start = to
+    for start, end in reversed(before):
+        block_start -= end - start
+        if start != block_start:
+            commands.append(("move", (f"{start}:{end}", block_start)))
+    # Ranges below it are appended to it, the closest first, the ones further down don't shift
+    block_end = to
+    for start, end in after:
+        if start != block_end:
+            commands.append(("move", (f"{start}:{end}", block_end)))
+        block_end += end - start
+    return commands
+
+
+def song_text(song):
+    '''Return the text a queued song is listed with'''
+    title = tag_value(song, "title") or posixpath.basename(song.get("file", ""))
+    artist = tag_value(song, "artist")
+    return f"{artist} - {title}" if artist else title
+
+
+class QueueModel(QAbstractListModel):
+    '''MPD's queue, fetched a window at a time as rows are shown and kept in sync with MPD's changes'''
+    # Rows fetched by a single playlistinfo
+    PAGE_SIZE = 200
+
+    def __init__(self, mpd_manager):
+        super().__init__()
+        self.mpd_manager = mpd_manager
+        # Song id at each position, None until its window is fetched
+        self.ids = []
+        # Text of each song id, kept when songs move so only new songs are fetched
+        self.texts = {}
+        # Queue version the ids belong to, None until the first status
+        self.version = None
+        # Position of the current song
+        self.current = -1
+        # Windows being fetched
+        self.requested = set()
+        # Changed on every reset, results fetched before it are dropped
+        self.generation = 0
+        # Changes are only fetched while the queue is shown, the latest status is applied when it's shown again
+        self.active = False
+        self.latest_status = None
+        self.syncing = False
+
+    def rowCount(self, parent=QModelIndex()): # pylint: disable=C0103
+        '''Return the length of the queue'''
+        if parent.isValid():
+            return 0
+        return len(self.ids)
+
+    def data(self, index, role=Qt.DisplayRole):
+        '''Return the text of a queued song, fetching its window the first time it's shown'''
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == Qt.DisplayRole:
+            text = self.texts.get(self.ids[row])
+            if text is None:
+                self.fetch_window(row // self.PAGE_SIZE)
+                return f"{row + 1}. ..."
+            return f"{row + 1}. {text}"
+        if role == Qt.FontRole and row == self.current:
+            font = QFont()
+            font.setBold(True)
+            return font
+        return None
+
+    def song_id(self, row):
+        '''Return the id of the song at a position, None if it hasn't been fetched'''
+        return self.ids[row]
+
+    def in_sync(self):
+        '''Return whether the rows match MPD's queue, positions sent to MPD are only right then'''
+        return (
+            self.version is not None and not self.syncing and self.latest_status is not None
+            and int(self.latest_status.get("playlist", 0)) == self.version
+        )
+
+    def fetch_window(self, page):
+        '''Fetch the songs of a window of rows'''
+        if page in self.requested:
+            return
+        self.requested.add(page)
+        start = page * self.PAGE_SIZE
+        generation = self.generation
+        self.mpd_manager.submit(
+            "playlistinfo", f"{start}:{start + self.PAGE_SIZE}",
+            callback=lambda songs: self.window_fetched(page, songs, generation),
+            errback=lambda e: self.window_failed(page, e)
+        )
+
+    def window_fetched(self, page, songs, generation):
+        '''Store the fetched songs and show them'''
+        if generation != self.generation:
+            return
+        self.requested.discard(page)
+        for song in songs:
+            position = int(song["pos"])
+            self.texts[song["id"]] = song_text(song)
+            # The window may be newer than the ids, the pending changes fix the positions that moved
+            if position < len(self.ids) and self.ids[position] is None:
+                self.ids[position] = song["id"]
+        start = page * self.PAGE_SIZE
+        end = min(start + self.PAGE_SIZE, len(self.ids)) - 1
+        if start <= end:
+            self.dataChanged.emit(self.index(start), self.index(end), [Qt.DisplayRole])
+
+    def window_failed(self, page, error):
+        '''Allow fetching the window again'''
+        self.requested.discard(page)
+        print("An error occurred while fetching the queue: ", error)
+
+    def set_active(self, active):
+        '''Follow MPD's changes while the queue is shown, catching up when it's shown again'''
+        self.active = active
+        if active and self.latest_status is not None:
+            self.playlist_changed(self.latest_status)
+
+    def playlist_changed(self, status):
+        '''Apply the changes MPD made to the queue since the version the model shows'''
+        self.latest_status = status
+        if not self.active or self.syncing:
+            return
+        version = int(status.get("playlist", 0))
+        if self.version is None or version < self.version:
+            # First load, or MPD restarted and its versions and ids start over
+            self.reset(version, int(status.get("playlistlength", 0)))
+        elif version != self.version:
+            self.syncing = True
+            generation = self.generation
+            self.mpd_manager.submit(
+                queue_changes, self.version,
+                callback=lambda result: self.apply_changes(*result, generation),
+                errback=self.changes_failed
+            )
+
+    def apply_changes(self, changes, status, generation):
+        '''Resize the queue and update the positions that changed'''
+        self.syncing = False
+        if generation != self.generation:
+            return
+        length = int(status.get("playlistlength", 0))
+        count = len(self.ids)
+        if length < count:
+            self.beginRemoveRows(QModelIndex(), length, count - 1)
+            del self.ids[length:]
+            self.endRemoveRows()
+        elif length > count:
+            self.beginInsertRows(QModelIndex(), count, length - 1)
+            self.ids.extend([None] * (length - count))
+            self.endInsertRows()
+        first, last = length, -1
+        for change in changes:
+            position = int(change["cpos"])
+            if position < length:
+                self.ids[position] = change["id"]
+                first = min(first, position)
+                last = max(last, position)
+        self.version = int(status.get("playlist", 0))
+        self.set_current(status)
+        if first <= last:
+            self.dataChanged.emit(self.index(first), self.index(last), [Qt.DisplayRole])
+        # Songs removed from the queue are forgotten once they make up most of the texts
+        if len(self.texts) > 2 * length + 1000:
+            present = set(self.ids)
+            self.texts = {song_id: text for song_id, text in self.texts.items() if song_id in present}
+        # The queue may have changed again while the changes were on their way
+        if self.latest_status is not None and int(self.latest_status.get("playlist", 0)) != self.version:
+            self.playlist_changed(self.latest_status)
+
+    def changes_failed(self, error):
+        '''Reload the queue, the changes couldn't be fetched'''
+        self.syncing = False
+        print("An error occurred while syncing the queue: ", error)
+        self.version = None
+        if self.latest_status is not None:
+            self.playlist_changed(self.latest_status)
+
+    def reset(self, version, length):
+        '''Forget every song, windows are fetched again as they are shown'''
+        self.beginResetModel()
+        self.generation += 1
+        self.ids = [None] * length
+        self.texts = {}
+        self.requested.clear()
+        self.version = version
+        self.endResetModel()
+
+    def set_current(self, status):
+        '''Highlight the current song'''
+        current = int(status.get("song", -1))
+        if current == self.current:
+            return
+        previous, self.current = self.current, current
+        for row in (previous, current):
+            if 0 <= row < len(self.ids):
+                self.dataChanged.emit(self.index(row), self.index(row), [Qt.FontRole])
+
+    def connection_changed(self, connected):
+        '''Song ids and versions may start over after a reconnect, reload the queue then'''
+        if not connected:
+            self.version = None
+            self.latest_status = None
+
+
+class QueueWindow(QMainWindow):
+    '''Window listing MPD's queue, double click a song to play it'''
+    def __init__(self, mpd_manager, queue_background, queue_stylesheet, tbar_stylesheet):
+        super().__init__()
+        self.setWindowTitle("Pyamp - Queue")
+        self.setWindowFlags(Qt.FramelessWindowHint)
+        self.setGeometry(0, 0, 410, 770)
+        self.setFixedSize(self.size())
+
+        stylesheet = queue_stylesheet
+
+        # The pixmap is shared with the other windows through the asset cache
+        self.background_image = queue_background
+        self.setMask(self.background_image.mask())
+
+        self.central_widget = QWidget()
+        self.setCentralWidget(self.central_widget)
+        self.layout = QVBoxLayout()
+        self.central_widget.setLayout(self.layout)
+
+        self.mpd_manager = mpd_manager
+
+        self.title_bar = createTitleBar(self, "Pyamp 1.0 - Queue", tbar_stylesheet, mpd_manager, None, None, button=False)
+        self.setMenuWidget(self.title_bar)
+
+        # Only the visible rows are fetched from MPD
+        self.model = QueueModel(mpd_manager)
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setStyleSheet(stylesheet)
+        self.list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.list_view.doubleClicked.connect(self.play_song)
+        self.layout.addWidget(self.list_view)
+
+        status_watcher = mpd_manager.status_watcher
+        status_watcher.playlistChanged.connect(self.model.playlist_changed)
+        status_watcher.statusChanged.connect(self.model.set_current)
+        status_watcher.connectionChanged.connect(self.model.connection_changed)
+        # The queue may already be known
+        if status_watcher.status:
+            self.model.latest_status = status_watcher.status
+
+        # Buttons, the selection is sent as a few ranges however many songs it has
+        self.button_container = QWidget()
+        self.button_container_layout = QHBoxLayout(self.button_container)
+        for text, action in (
+            ("Delete", self.delete_selected),
+            ("Play Next", self.play_next),
+            ("Shuffle", self.shuffle_selected),
+            ("Crop", self.crop),
+        ):
+            button = QPushButton(text)
+            button.setStyleSheet(stylesheet)
+            button.clicked.connect(action)
+            self.button_container_layout.addWidget(button)
+            if action == self.shuffle_selected:
+                self.shuffle_button = button
+        self.close_button = QPushButton("Close")
+        self.close_button.setStyleSheet(stylesheet)
+        self.close_button.clicked.connect(self.close)
+        self.button_container_layout.addWidget(self.close_button)
+        self.layout.addWidget(self.button_container)
+        # Shuffle only works on runs of at least two selected songs
+        self.list_view.selectionModel().selectionChanged.connect(self.update_buttons)
+        self.model.modelReset.connect(self.update_buttons)
+        self.update_buttons()
+
+    def update_buttons(self):
+        '''Enable the shuffle button when a run of at least two songs is selected'''
+        self.shuffle_button.setEnabled(bool(self.shuffle_ranges()))
+
+    def play_song(self, index):
+        '''Play the double clicked song'''
+        self.mpd_manager.submit("play", index.row())
+
+    def selected_ranges(self):
+        '''Return the selected rows as merged (start, end) ranges'''
+        selection = self.list_view.selectionModel().selection()
+        return merge_ranges((selection_range.top(), selection_range.bottom() + 1) for selection_range in selection)
+
+    def edit_queue(self, commands):
+        '''Send commands editing the queue in a single command list'''
+        if not commands:
+            return
+        if not self.model.in_sync():
+            # The rows are about to move, positions taken from them could hit the wrong songs
+            print("The queue is being updated, try again")
+            return
+        self.list_view.clearSelection()
+        self.mpd_manager.submit(
+            run_command_list, commands,
+            callback=lambda failures: [print(f"An error occurred while editing the queue at {argument}: {error}")
+                                       for argument, error in failures],
+            errback=lambda e: print("An error occurred while editing the queue: ", e)
+        )
+
+    def delete_selected(self):
+        '''Remove the selected songs from the queue'''
+        self.edit_queue(delete_commands(self.selected_ranges()))
+
+    def play_next(self):
+        '''Move the selected songs right after the current one'''
+        current = self.model.current
+        self.edit_queue(move_commands(self.selected_ranges(), current + 1 if current >= 0 else 0))
+
+    def shuffle_ranges(self):
+        '''Return the selected ranges with at least two songs'''
+        return [(start, end) for start, end in self.selected_ranges() if end - start > 1]
+
+    def shuffle_selected(self):
+        '''Shuffle each selected range of at least two songs'''
+        self.edit_queue([("shuffle", (f"{start}:{end}",)) for start, end in self.shuffle_ranges()])
+
+    def crop(self):
+        '''Remove every song but the current one'''
+        current = self.model.current
+        if current < 0:
+            return
+        self.edit_queue(delete_commands([(0, current), (current + 1, self.model.rowCount())]))
+
+    def showEvent(self, event): # pylint: disable=invalid-name
+        '''Catch up with the changes made while the window was hidden'''
+        super().showEvent(event)
+        self.model.set_active(True)
+
+    def hideEvent(self, event): # pylint: disable=invalid-name
+        '''Stop following the queue while it isn't shown'''
+        super().hideEvent(event)
+        self.model.set_active(False)
+
+    def keyPressEvent(self, event): # pylint: disable=C0103
+        '''Close the window on q or esc key press'''
+        if event.key() == Qt.Key_Q or event.key() == Qt.Key_Escape:
+            self.close()
+        elif event.key() == Qt.Key_Delete:
+            self.delete_selected()
+        else:
+            super().keyPressEvent(event)
+
+    def paintEvent(self, event): # pylint: disable=invalid-name,unused-argument
+        '''Draw the window with a background image'''
+        painter = QPainter(self)
+        painter.drawPixmap(self.rect(), self.background_image)
@@ -0,0 +1,158 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from time import monotonic, time
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QObject, QTimer, QEvent, Qt, Signal
+
+
+class ScheduledTask:
+    '''A periodic update run by the scheduler'''
+    def __init__(self, interval, callback, slack, wall_clock):
+        # Seconds between runs
+        self.interval = interval
+        self.callback = callback
+        # Seconds the run may be delayed so it shares a wakeup with other tasks
+        self.slack = slack
+        # Run on multiples of the interval in local time, like a clock changing minute
+        self.wall_clock = wall_clock
+        self.active = True
+        self.due = 0.0
+        # Runs, for the wakeup report
+        self.runs = 0
+
+    def schedule(self, now, previous=None):
+        '''Set the monotonic time of the next run'''
+        if self.wall_clock:
+            self.due = now + self.interval - time() % self.interval
+        elif previous is not None and previous + self.interval > now:
+            # Late runs don't push the next ones back
+            self.due = previous + self.interval
+        else:
+            self.due = now + self.interval
+
+
+class UiScheduler(QObject):
+    '''A single timer for the periodic updates of the windows, suspended while they can't be seen'''
+    # True while every watched window is hidden, minimized or covered
+    suspendedChanged = Signal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tasks = {}
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        # The slack of each task is the precision that matters, the timer may fire a little late
+        self.timer.setTimerType(Qt.CoarseTimer)
+        self.timer.timeout.connect(self.run_due)
+        self.windows = []
+        self.suspended = False
+        # Set by stop(), nothing runs anymore
+        self.stopped = False
+        self.wakeups = 0
+        QApplication.instance().applicationStateChanged.connect(self.update_suspended)
+
+    def add(self, name, interval, callback, slack=0.1, wall_clock=False):
+        '''Call callback every interval seconds'''
+        task = ScheduledTask(interval, callback, slack, wall_clock)
+        task.schedule(monotonic())
+        self.tasks[name] = task
+        self.schedule()
+
+    def set_active(self, name, active):
+        '''Start or stop running a task, e.g. the progress bar while nothing is playing'''
+        task = self.tasks[name]
+        if task.active == active:
+            return
+        task.active = active
+        if active:
+            task.schedule(monotonic())
+        self.schedule()
+
+    def watch(self, window):
+        '''Suspend the updates while this window, and every other watched one, can't be seen'''
+        self.windows.append(window)
+        window.installEventFilter(self)
+        self.update_suspended()
+
+    def eventFilter(self, watched, event): # pylint: disable=invalid-name
+        '''Follow the visibility of the watched windows'''
+        if event.type() in (QEvent.Show, QEvent.Hide, QEvent.WindowStateChange, QEvent.Expose):
+            if event.type() == QEvent.Show and watched in self.windows and watched.windowHandle():
+                # Exposure, lost when the window is covered or the screen is locked, is reported to the QWindow
+                watched.windowHandle().installEventFilter(self)
+            self.update_suspended()
+        return False
+
+    def can_be_seen(self, window):
+        '''Return whether a window is shown, not minimized and exposed'''
+        handle = window.windowHandle()
+        return window.isVisible() and not window.isMinimized() and (handle is None or handle.isExposed())
+
+    def update_suspended(self):
+        '''Suspend or resume the updates'''
+        if self.stopped:
+            return
+        state = QApplication.instance().applicationState()
+        suspended = bool(self.windows) and (
+            state in (Qt.ApplicationHidden, Qt.ApplicationSuspended)
+            or not any(self.can_be_seen(window) for window in self.windows)
+        )
+        if suspended == self.suspended:
+            return
+        self.suspended = suspended
+        if suspended:
+            self.timer.stop()
+        else:
+            # Catch up in one go, then carry on from now
+            now = monotonic()
+            for task in self.tasks.values():
+                if task.active:
+                    task.due = now
+            self.run_due()
+        self.suspendedChanged.emit(suspended)
+
+    def run_due(self):
+        '''Run every task that is due, then wait for the next one'''
+        self.wakeups += 1
+        now = monotonic()
+        for task in list(self.tasks.values()):
+            if task.active and task.due <= now:
+                previous = task.due
+                task.runs += 1
+                try:
+                    task.callback()
+                except Exception as e:
+                    print("An error occurred while updating the window: ", e)
+                task.schedule(now, previous)
+        self.schedule()
+
+    def schedule(self):
+        '''Start the timer for the earliest deadline, tasks due by then share the wakeup'''
+        deadlines = [task.due + task.slack for task in self.tasks.values() if task.active]
+        if self.stopped or self.suspended or not deadlines:
+            self.timer.stop()
+            return
+        self.timer.start(max(0, int((min(deadlines) - monotonic()) * 1000)))
+
+    def stop(self):
+        '''Stop every task for good, used when the window closes'''
+        self.stopped = True
+        self.timer.stop()
+
+    def report(self):
+        '''Return how often the scheduler woke up and how often each task ran'''
+        runs = ", ".join(f"{name}={task.runs}" for name, task in self.tasks.items())
+        return f"UI wakeups: {self.wakeups} ({runs})"
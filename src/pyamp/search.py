@@ -0,0 +1,324 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import threading
+from array import array
+from bisect import bisect_right
+from PySide6.QtCore import QThread, Signal
+
+# Fields usable as "field:term", plain terms don't look into paths
+FIELDS = ("title", "artist", "album", "file")
+PLAIN_FIELDS = ("title", "artist", "album")
+
+
+def parse_query(text):
+    '''Split a query into (field, term) pairs, field is None for plain terms'''
+    terms = []
+    for word in text.lower().split():
+        field, _, term = word.partition(":")
+        if term and field in FIELDS:
+            terms.append((field, term))
+        elif word:
+            terms.append((None, word))
+    return terms
+
+
+def narrows(previous, terms):
+    '''Return True if every result of the previous terms is a candidate for the new ones'''
+    if previous is None:
+        return False
+    # Each old term must still be there, possibly longer
+    return all(
+        any(field == old_field and old_term in term for field, term in terms)
+        for old_field, old_term in previous
+    )
+
+
+class Haystack:
+    '''Strings joined by newlines and searched with str.find'''
+    def __init__(self):
+        self.text = ""
+        self.pending = []
+        # Offset of every string, plus the end of the last one
+        self.starts = array('I', [0])
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    def extend(self, strings):
+        '''Append strings, they become searchable after flush()'''
+        length = self.starts[-1]
+        for string in strings:
+            length += len(string) + 1
+            self.starts.append(length)
+        self.pending.extend(strings)
+
+    def flush(self):
+        '''Join the pending strings to the text'''
+        if self.pending:
+            self.pending.append("")
+            self.text = "".join((self.text, "\n".join(self.pending)))
+            self.pending = []
+
+    def contains(self, string_id, term):
+        '''Check if the given string contains the term'''
+        return self.text.find(term, self.starts[string_id], self.starts[string_id + 1] - 1) != -1
+
+    def find(self, term):
+        '''Return the ids of the strings containing the term'''
+        text = self.text
+        starts = self.starts
+        string_ids = []
+        position = text.find(term)
+        while position != -1:
+            string_id = bisect_right(starts, position) - 1
+            string_ids.append(string_id)
+            # A string only needs to match once
+            position = text.find(term, starts[string_id + 1])
+        return string_ids
+
+
+class FieldIndex:
+    '''Word index over the lowercased values of one tag'''
+    def __init__(self, dedupe):
+        # Dedupe tags shared by many tracks (artists, albums)
+        self.dedupe = dedupe
+        # Distinct values when deduping, otherwise one per track
+        self.values = Haystack()
+        # Every distinct word, scanned to find the words containing a term
+        self.words = Haystack()
+        self.word_ids = {}
+        # Word id to the ids of the values containing it
+        self.postings = []
+        # Value id to track ids, and track id to value id, only when deduping
+        self.value_ids = {}
+        self.members = []
+        self.track_values = array('I')
+
+    def extend(self, values):
+        '''Index the values of the next tracks'''
+        values = [value.lower() for value in values]
+        if not self.dedupe:
+            self.append(values)
+            return
+        new_values = []
+        value_ids = self.value_ids
+        for value in values:
+            value_id = value_ids.get(value)
+            if value_id is None:
+                value_id = value_ids[value] = len(self.values) + len(new_values)
+                new_values.append(value)
+                self.members.append(array('I'))
+            self.members[value_id].append(len(self.track_values))
+            self.track_values.append(value_id)
+        self.append(new_values)
+
+    def append(self, values):
+        '''Add new values and index their words'''
+        first = len(self.values)
+        self.values.extend(values)
+        word_ids = self.word_ids
+        postings = self.postings
+        new_words = []
+        for value_id, value in enumerate(values, first):
+            # Terms never contain whitespace, so a term is in a value if it's in one of its words
+            for word in set(value.split()):
+                word_id = word_ids.get(word)
+                if word_id is None:
+                    word_id = word_ids[word] = len(postings)
+                    new_words.append(word)
+                    postings.append(array('I'))
+                postings[word_id].append(value_id)
+        self.words.extend(new_words)
+
+    def flush(self):
+        '''Make the values and words added since the last search searchable'''
+        self.values.flush()
+        self.words.flush()
+
+    def contains(self, track_id, term):
+        '''Check if the value of the given track contains the term'''
+        return self.values.contains(self.track_values[track_id] if self.dedupe else track_id, term)
+
+    def find(self, term):
+        '''Return the ids of the tracks whose value contains the term'''
+        value_ids = set()
+        for word_id in self.words.find(term):
+            value_ids.update(self.postings[word_id])
+        if not self.dedupe:
+            return value_ids
+        track_ids = set()
+        for value_id in value_ids:
+            track_ids.update(self.members[value_id])
+        return track_ids
+
+
+class SearchIndex:
+    '''In-memory index answering substring queries over the library's tags, used by a single thread'''
+    # Past this many results, refining them costs more than a new search
+    NARROW_LIMIT = 20000
+
+    def __init__(self, store):
+        self.store = store
+        self.fields = {}
+        self.size = 0
+        self.indexed = 0
+        self.clear()
+
+    def add_tracks(self, end):
+        '''Queue the tracks of the store up to end for indexing'''
+        self.size = end
+
+    def clear(self):
+        '''Remove every track'''
+        self.fields = {
+            "title": FieldIndex(False),
+            "artist": FieldIndex(True),
+            "album": FieldIndex(True),
+            "file": FieldIndex(False),
+        }
+        self.size = 0
+        self.indexed = 0
+        # The last query and its results, refined while the user keeps typing
+        self.last_terms = None
+        self.last_results = None
+
+    def update(self):
+        '''Index the tracks added since the last update'''
+        if self.indexed < self.size:
+            columns = {
+                "title": self.store.titles,
+                "artist": self.store.artists,
+                "album": self.store.albums,
+                "file": self.store.files,
+            }
+            for field, column in columns.items():
+                self.fields[field].extend(column[self.indexed:self.size])
+            self.indexed = self.size
+            # New tracks may match the last query
+            self.last_terms = None
+        for index in self.fields.values():
+            index.flush()
+
+    def search(self, text):
+        '''Return the sorted ids of the tracks matching every term, None for an empty query'''
+        terms = parse_query(text)
+        if not terms:
+            return None
+        self.update()
+        if narrows(self.last_terms, terms) and len(self.last_results) <= self.NARROW_LIMIT:
+            # Only the previous results can still match
+            results = self.refine(self.last_results, terms)
+        else:
+            results = None
+            # Rarer terms first, the intersection only shrinks
+            for field, term in sorted(terms, key=lambda item: -len(item[1])):
+                found = self.find(field, term)
+                results = found if results is None else results & found
+                if not results:
+                    break
+            results = sorted(results)
+        self.last_terms = terms
+        self.last_results = results
+        return results
+
+    def find(self, field, term):
+        '''Return the set of tracks matching a term, plain terms match the title, artist or album'''
+        if field is not None:
+            return self.fields[field].find(term)
+        track_ids = set()
+        for field in PLAIN_FIELDS:
+            track_ids |= self.fields[field].find(term)
+        return track_ids
+
+    def refine(self, track_ids, terms):
+        '''Return the given tracks matching every term'''
+        fields = self.fields
+        return [
+            track_id for track_id in track_ids
+            if all(
+                any(fields[field].contains(track_id, term) for field in (PLAIN_FIELDS if name is None else (name,)))
+                for name, term in terms
+            )
+        ]
+
+
+class SearchWorker(QThread):
+    '''Run searches and indexing off the GUI thread, only the latest query is ever answered'''
+    # Query, matching rows and the generation of the store they were found in
+    resultsReady = Signal(str, object, int)
+
+    def __init__(self, index):
+        super().__init__()
+        # Only touched by the worker thread, the GUI thread never waits for an indexing pass
+        self.index = index
+        self.condition = threading.Condition()
+        self.query = None
+        # Tracks of the store to index, and whether the index must be emptied first
+        self.size = 0
+        self.reset = False
+        # Bumped by clear(), results found in an older store are stale
+        self.generation = 0
+        self.running = True
+
+    def search(self, text):
+        '''Replace the pending query'''
+        with self.condition:
+            self.query = text
+            self.condition.notify()
+
+    def add_tracks(self, end):
+        '''Index the tracks of the store up to end in the background'''
+        with self.condition:
+            self.size = end
+            self.condition.notify()
+
+    def clear(self):
+        '''Empty the index before the tracks added next'''
+        with self.condition:
+            self.size = 0
+            self.reset = True
+            self.generation += 1
+            self.condition.notify()
+
+    def run(self):
+        '''Answer queries until stop() is called, indexing new tracks in between'''
+        while True:
+            with self.condition:
+                while self.query is None and self.running and not self.reset and self.size == self.index.size:
+                    self.condition.wait()
+                if not self.running:
+                    break
+                text = self.query
+                self.query = None
+                reset, self.reset = self.reset, False
+                size = self.size
+                generation = self.generation
+            if reset:
+                self.index.clear()
+            self.index.add_tracks(size)
+            if text is None:
+                # Index new tracks before the user searches for them
+                self.index.update()
+            else:
+                self.resultsReady.emit(text, self.index.search(text), generation)
+
+    def stop(self):
+        '''Wait for the current search to finish and exit'''
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.wait()
+
@@ -0,0 +1,77 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import sys
+import random
+from statistics import median
+from time import perf_counter
+from pyamp.library import TrackStore
+from pyamp.search import SearchIndex
+
+
+def main():
+    '''Benchmark query latency, "python -m pyamp.search_benchmark [tracks]"'''
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    rng = random.Random(0)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))) for _ in range(5000)]
+    store = TrackStore()
+    songs = []
+    for track in range(size):
+        # Roughly 12 tracks per album and 3 albums per artist
+        album_id = track // 12
+        artist = " ".join(words[(album_id // 3 + i) % len(words)] for i in range(2)).title()
+        album = " ".join(words[(album_id * 7 + i) % len(words)] for i in range(2)).title()
+        title = " ".join(rng.choice(words) for _ in range(rng.randint(1, 4))).title()
+        songs.append({
+            "file": f"{artist}/{album}/{track % 12:02d} {title}.flac",
+            "title": title,
+            "artist": artist,
+            "album": album,
+        })
+    store.add_songs(songs)
+
+    index = SearchIndex(store)
+    start = perf_counter()
+    index.add_tracks(len(store))
+    index.search("warmup")
+    print(f"Indexed {size} tracks in {perf_counter() - start:.2f}s")
+
+    # Fresh queries by kind, then a query typed one character at a time
+    typed = rng.choice(words) + " " + rng.choice(words)
+    benchmarks = {
+        "plain": [rng.choice(words) for _ in range(50)],
+        "artist:": [f"artist:{rng.choice(words)[:4]}" for _ in range(20)],
+        "plain + album:": [f"{rng.choice(words)[:4]} album:{rng.choice(words)[:3]}" for _ in range(20)],
+        "file:": [f"file:{rng.choice(words)}" for _ in range(10)],
+        "typing": [typed[:i] for i in range(1, len(typed) + 1)],
+    }
+    for label, queries in benchmarks.items():
+        latencies = []
+        index.last_terms = None
+        for query in queries:
+            if label != "typing":
+                index.last_terms = None
+            start = perf_counter()
+            index.search(query)
+            latencies.append((perf_counter() - start) * 1000)
+        latencies.sort()
+        print(
+            f"{label:>15}: {len(latencies)} queries, median {median(latencies):.2f}ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95)]:.2f}ms, max {latencies[-1]:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
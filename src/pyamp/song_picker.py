@@ -13,7 +13,7 @@
 #
 #    You should have received a copy of the GNU General Public License
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
-import base64
+from bisect import bisect_left
 from PySide6.QtWidgets import (
     QMainWindow,
     QLineEdit,
@@ -21,26 +21,22 @@ from PySide6.QtWidgets import (
     QPushButton,
     QHBoxLayout,
     QVBoxLayout,
-    QListWidgetItem,
-    QListWidget,
+    QListView,
     QAbstractItemView
 )
-from PySide6.QtGui import QPixmap, QPainter
-from PySide6.QtCore import Qt, Signal
+from PySide6.QtGui import QPainter
+from PySide6.QtCore import Qt, Signal, QTimer, QItemSelection, QItemSelectionModel
 from pyamp.ui import createTitleBar
-
-class SongItem(QListWidgetItem):
-    '''Song item'''
-    def __init__(self, title, uri):
-        super().__init__(title)
-        self.uri = uri
+from pyamp.library import TrackStore, SongListModel, LibraryCache, LibraryLoader
+from pyamp.search import SearchIndex, SearchWorker, parse_query
+from pyamp.queue_view import QueueWindow
 
 
 class SongPickerWindow(QMainWindow):
     '''Window to select and add songs to the queue'''
     window_close = Signal()
 
-    def __init__(self, mpd_manager, img_song_picker_background, spicker_stylesheet, tbar_stylesheet):
+    def __init__(self, mpd_manager, song_picker_background, spicker_stylesheet, tbar_stylesheet):
         super().__init__()
         # Window title and geometry
         self.setWindowTitle("Pyamp - Song Picker")
@@ -48,19 +44,11 @@ class SongPickerWindow(QMainWindow):
         self.setGeometry(0, 0, 410, 770)
         self.setFixedSize(self.size())
 
-        img_background = img_song_picker_background
         stylesheet = spicker_stylesheet
 
-        # Window background and alpha channel
-        # Decode the base64 image data
-        background_data = base64.b64decode(img_background)
-
-        # Create a QPixmap from the binary data
-        background_pixmap = QPixmap()
-        background_pixmap.loadFromData(background_data)
-
         # Set the background image and mask
-        self.background_image = background_pixmap
+        # The pixmap is shared with the other windows through the asset cache
+        self.background_image = song_picker_background
         self.setMask(self.background_image.mask())
 
         # Layout and central widget
@@ -69,8 +57,8 @@ class SongPickerWindow(QMainWindow):
         self.layout = QVBoxLayout()
         self.central_widget.setLayout(self.layout)
 
-        # MPD client
-        self.client = mpd_manager.get_client()
+        # MPD commands run on the manager's worker thread
+        self.mpd_manager = mpd_manager
 
         # Title bar
         self.title_bar = createTitleBar(self, "Pyamp 1.0 - Song Picker", tbar_stylesheet, mpd_manager, None, None, button=False)
@@ -84,15 +72,34 @@ class SongPickerWindow(QMainWindow):
 
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("Search...")
-        self.search_bar.textChanged.connect(self.filter_options)
+        self.search_bar.textChanged.connect(self.search_timer_restart)
         self.search_bar.setStyleSheet(stylesheet)
         self.layout.addWidget(self.search_bar)
 
-        self.list_widget = QListWidget()
-        self.list_widget.setStyleSheet(stylesheet)
-        self.list_widget.setSelectionMode(QAbstractItemView.MultiSelection)
-        self.list_widget.setSelectionBehavior(QAbstractItemView.SelectItems)
-        self.layout.addWidget(self.list_widget)
+        # Only the visible rows are ever rendered
+        self.track_store = TrackStore()
+        self.model = SongListModel(self.track_store)
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setStyleSheet(stylesheet)
+        self.list_view.setSelectionMode(QAbstractItemView.MultiSelection)
+        self.list_view.setSelectionBehavior(QAbstractItemView.SelectItems)
+        self.layout.addWidget(self.list_view)
+
+        # Searches run on their own thread once the user stops typing
+        self.search_index = SearchIndex(self.track_store)
+        self.search_worker = SearchWorker(self.search_index)
+        self.search_worker.resultsReady.connect(self.show_results)
+        self.search_worker.start()
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.filter_options)
+
+        # Selected track ids, kept across searches
+        self.selected_tracks = set()
+        self.list_view.selectionModel().selectionChanged.connect(self.selection_changed)
 
         # Buttons
         self.ok_button = QPushButton("OK")
@@ -100,6 +107,11 @@ class SongPickerWindow(QMainWindow):
         self.ok_button.setStyleSheet(stylesheet)
         self.button_container_layout.addWidget(self.ok_button)
 
+        self.add_all_button = QPushButton("Add All")
+        self.add_all_button.clicked.connect(self.on_add_all_clicked)
+        self.add_all_button.setStyleSheet(stylesheet)
+        self.button_container_layout.addWidget(self.add_all_button)
+
         self.cancel_button = QPushButton("Cancel")
         self.cancel_button.clicked.connect(self.close_song_picker)
         self.cancel_button.setStyleSheet(stylesheet)
@@ -110,15 +122,35 @@ class SongPickerWindow(QMainWindow):
         self.button_container_layout.addWidget(self.clear_button)
         self.clear_button.clicked.connect(self.clear_queue)
 
+        self.queue_button = QPushButton("Queue")
+        self.queue_button.setStyleSheet(stylesheet)
+        self.button_container_layout.addWidget(self.queue_button)
+        self.queue_button.clicked.connect(self.open_queue)
+        # Built the first time it's opened
+        self.queue_window = None
+        self.tbar_stylesheet = tbar_stylesheet
+
         self.layout.addWidget(self.button_container)
 
         self.delay_active = None
 
-        self.fetch_songs()
+        # The library streams in once the main window is up, see fetch_songs
+        self.library_cache = LibraryCache()
+        self.library_loader = None
+        # Only the changed directories are fetched again after MPD updates its database
+        mpd_manager.status_watcher.databaseChanged.connect(lambda: self.fetch_songs(update=True))
 
     def clear_queue(self):
         '''Clear the MPD queue'''
-        self.client.clear()
+        self.mpd_manager.submit("clear")
+
+    def open_queue(self):
+        '''Open the queue window'''
+        if self.queue_window is None:
+            self.queue_window = QueueWindow(
+                self.mpd_manager, self.background_image, self.search_bar.styleSheet(), self.tbar_stylesheet
+            )
+        self.queue_window.show()
 
     def paintEvent(self, event): # pylint: disable=invalid-name,unused-argument
         '''Draw the window with a background image'''
@@ -126,43 +158,122 @@ class SongPickerWindow(QMainWindow):
         painter.drawPixmap(self.rect(), self.background_image)
         self.delay_active = False
 
-    def fetch_songs(self):
-        '''Fetch songs from MPD'''
-        # Clear the widget
-        self.list_widget.clear()
-        # Get all songs
-        songs = self.client.listallinfo()
+    def fetch_songs(self, update=False):
+        '''Load the songs from the cache or MPD in the background, replacing the current list'''
+        self.cancel_fetch()
+        # Rows show up as the cache is read or as MPD sends each directory
+        loader = LibraryLoader(self.mpd_manager.connection("library"), self.library_cache, update)
+        loader.libraryReset.connect(self.reset_songs)
+        loader.songsLoaded.connect(self.show_songs)
+        loader.loadFinished.connect(self.fetch_finished)
+        # loadFinished comes before the thread exits, it's only released once it has
+        loader.finished.connect(lambda: self.release_loader(loader))
+        self.library_loader = loader
+        loader.start()
+
+    def cancel_fetch(self):
+        '''Stop loading the library, the songs already loaded stay listed'''
+        if self.library_loader is not None:
+            self.library_loader.cancel()
+            self.library_loader.deleteLater()
+            self.library_loader = None
+            self.search_bar.setPlaceholderText("Search...")
+
+    def reset_songs(self):
+        '''Clear the list before a new copy of the library is loaded'''
+        self.search_worker.clear()
+        self.model.clear()
+        self.selected_tracks.clear()
+        self.search_bar.setPlaceholderText("Loading...")
+
+    def show_songs(self, columns):
+        '''Add a batch of songs loaded by the library loader to the list'''
         # Gotta Display 'em all
-        for song in songs:
-            title = song.get("title", None)
-            if title:
-                item = SongItem(title, song.get("file", ""))
-                self.list_widget.addItem(item)
+        self.model.add_columns(columns)
+        self.search_worker.add_tracks(len(self.track_store))
+        self.search_bar.setPlaceholderText(f"Loading... {len(self.track_store)} songs")
+        # The new songs may match the current search
+        if self.search_bar.text().strip():
+            self.search_timer_restart()
+
+    def fetch_finished(self, loaded): # pylint: disable=unused-argument
+        '''Show the search placeholder again once the whole library is listed'''
+        self.search_bar.setPlaceholderText("Search...")
+
+    def release_loader(self, loader):
+        '''Forget a loader whose thread has exited'''
+        if self.library_loader is loader:
+            self.library_loader = None
+        loader.deleteLater()
+
+    def search_timer_restart(self):
+        '''Wait for the user to stop typing before searching'''
+        self.search_timer.start()
 
     def filter_options(self):
         '''Filter displayed songs by search'''
-        search_text = self.search_bar.text().lower()
-        for index in range(self.list_widget.count()):
-            item = self.list_widget.item(index)
-            # Hide all items that dont match the search string
-            if search_text in item.text().lower():
-                item.setHidden(False)
+        search_text = self.search_bar.text()
+        if not search_text.strip():
+            self.model.set_rows(None)
+            self.restore_selection()
+        else:
+            # Matches every term against the title, artist and album, "field:term" looks in a single tag
+            self.search_worker.search(search_text)
+
+    def show_results(self, search_text, rows, generation):
+        '''Show the tracks matching a search, unless the user has typed something else since'''
+        if search_text != self.search_bar.text():
+            return
+        # Found before the library was reloaded, the search runs again as the new songs come in
+        if generation != self.search_worker.generation:
+            return
+        self.model.set_rows(rows)
+        self.restore_selection()
+
+    def selection_changed(self, selected, deselected):
+        '''Keep track of the selected track ids'''
+        for index in selected.indexes():
+            self.selected_tracks.add(self.model.track_id(index.row()))
+        for index in deselected.indexes():
+            self.selected_tracks.discard(self.model.track_id(index.row()))
+
+    def restore_selection(self):
+        '''Select the visible rows whose tracks were selected before the list changed'''
+        selection = QItemSelection()
+        rows = self.model.rows
+        for track_id in self.selected_tracks:
+            if rows is None:
+                row = track_id
             else:
-                item.setHidden(True)
+                # Rows are sorted by track id
+                row = bisect_left(rows, track_id)
+                if row == len(rows) or rows[row] != track_id:
+                    continue
+            index = self.model.index(row)
+            selection.select(index, index)
+        self.list_view.selectionModel().select(selection, QItemSelectionModel.Select)
 
     def add_selected_songs(self):
         '''Add selected songs to the queue'''
-        selected_indexes = [index.row() for index in self.list_widget.selectedIndexes()]
-        selected_songs = []
-        for index in selected_indexes:
-            item = self.list_widget.item(index)
-            selected_songs.append(item.uri)
-        for song in selected_songs:
-            self.client.add(song)
+        selected_songs = [self.track_store.files[track_id] for track_id in sorted(self.selected_tracks)]
+        # Sent in batches, a few round trips for thousands of songs
+        self.mpd_manager.enqueuer.add_uris(selected_songs)
+
+    def add_all_songs(self):
+        '''Add every song the search shows, or the whole library without one'''
+        terms = parse_query(self.search_bar.text())
+        if terms and all(field is not None for field, _ in terms):
+            # "field:term" matches like MPD's search, MPD finds and adds the songs itself in one command
+            self.mpd_manager.enqueuer.search_add(*(value for term in terms for value in term))
+            return
+        rows = self.model.rows
+        files = self.track_store.files
+        self.mpd_manager.enqueuer.add_uris(list(files) if rows is None else [files[track_id] for track_id in rows])
 
     def clear_selection(self):
         '''Clear the song selection'''
-        self.list_widget.clearSelection()
+        self.list_view.clearSelection()
+        self.selected_tracks.clear()
 
     def on_ok_clicked(self):
         '''Close the window and updates song display when OK is pressed'''
@@ -170,6 +281,12 @@ class SongPickerWindow(QMainWindow):
         self.add_selected_songs()
         self.close()
 
+    def on_add_all_clicked(self):
+        '''Close the window and add every song shown'''
+        self.window_close.emit()
+        self.add_all_songs()
+        self.close()
+
     def close_song_picker(self):
         '''Close the song picker window'''
         self.close()
@@ -0,0 +1,125 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import sys
+import subprocess
+from time import perf_counter
+
+# When pyamp started, as close to launch as the first import of this module gets
+STARTED = perf_counter()
+# Time to first paint pyamp aims for, in seconds
+FIRST_PAINT_TARGET = 0.5
+# Seconds a cold "import pyamp.main" may take, checked by running this module
+IMPORT_BUDGET = 0.4
+# Optional dependencies only imported when a feature needs them
+LAZY_MODULES = ("mutagen", "PIL", "importlib.metadata")
+
+
+class StartupClock:
+    '''Measure the time from launch to the main window's first paint, phase by phase'''
+    def __init__(self, target=FIRST_PAINT_TARGET):
+        self.target = target
+        self.first_paint = None
+        # Print every phase, set by --profile-startup
+        self.profile = False
+        # (phase, seconds) in the order they ended
+        self.phases = []
+        # (enclosing phase, phase, seconds) spent inside another phase
+        self.details = []
+        self.last_mark = STARTED
+        self.connect_time = None
+
+    def mark(self, phase):
+        '''End a phase, it took the time since the previous one ended'''
+        now = perf_counter()
+        self.phases.append((phase, now - self.last_mark))
+        self.last_mark = now
+
+    def detail(self, phase, seconds):
+        '''Record time spent inside the last phase, e.g. decoding the theme while building the window'''
+        self.details.append((self.phases[-1][0], phase, seconds))
+
+    def connection_changed(self, connected):
+        '''Record when MPD first answered, it connects in the background while the window is built'''
+        if connected and self.connect_time is None:
+            self.connect_time = perf_counter() - STARTED
+            if self.profile and self.first_paint is not None:
+                print(f"  connect        {self.connect_time * 1000:7.1f}ms after launch")
+
+    def painted(self):
+        '''Record the first paint, return False for the ones after it'''
+        if self.first_paint is not None:
+            return False
+        self.mark("first paint")
+        self.first_paint = perf_counter() - STARTED
+        return True
+
+    def report(self):
+        '''Return the time to first paint and whether it met the target, along with the phases when profiling'''
+        verdict = "within" if self.first_paint <= self.target else "over"
+        line = f"First paint after {self.first_paint * 1000:.0f}ms ({verdict} the {self.target * 1000:.0f}ms target)"
+        if not self.profile:
+            return line
+        lines = [line]
+        for phase, seconds in self.phases:
+            lines.append(f"  {phase:<14} {seconds * 1000:7.1f}ms")
+            lines += [f"    {detail:<12} {time * 1000:7.1f}ms" for parent, detail, time in self.details if parent == phase]
+        if self.connect_time is not None:
+            lines.append(f"  connect        {self.connect_time * 1000:7.1f}ms after launch")
+        return "\n".join(lines)
+
+
+STARTUP_CLOCK = None
+
+
+def get_startup_clock():
+    '''Return the process wide startup clock'''
+    global STARTUP_CLOCK
+    if STARTUP_CLOCK is None:
+        STARTUP_CLOCK = StartupClock()
+    return STARTUP_CLOCK
+
+
+def measure_import():
+    '''Import pyamp.main in a new interpreter, return the seconds it took and the lazy modules it imported'''
+    code = (
+        "import sys, time; start = time.perf_counter(); import pyamp.main; "
+        f"print(time.perf_counter() - start); print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    seconds, _, imported = output.partition("\n")
+    return float(seconds), imported.split()
+
+
+def main():
+    '''Fail if a cold import of pyamp.main is over budget or imports optional dependencies eagerly'''
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else IMPORT_BUDGET
+    # The first run warms the disk cache, the best of the others is the least noisy
+    results = [measure_import() for _ in range(4)][1:]
+    seconds = min(result[0] for result in results)
+    imported = results[0][1]
+    print(f"import pyamp.main: {seconds * 1000:.0f}ms (budget {budget * 1000:.0f}ms)")
+    failed = False
+    if seconds > budget:
+        print("Over budget, see python -X importtime -c 'import pyamp.main'")
+        failed = True
+    if imported:
+        print(f"Imported eagerly: {', '.join(imported)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from time import monotonic
+from PySide6.QtCore import QThread, Signal
+from pyamp.connection import CONNECTION_ERRORS
+
+
+class PlaybackClock:
+    '''Interpolate the elapsed time of the current song between MPD events'''
+    def __init__(self):
+        self.state = "stop"
+        self.elapsed = 0.0
+        self.duration = 0.0
+        self.timestamp = monotonic()
+
+    def update(self, status):
+        '''Resync the clock with the given MPD status'''
+        self.state = status.get("state", "stop")
+        if "time" in status:
+            elapsed, duration = status["time"].split(":")
+            # Prefer the more precise fields when the server reports them
+            self.elapsed = float(status.get("elapsed", elapsed))
+            self.duration = float(status.get("duration", duration))
+        else:
+            self.elapsed = 0.0
+            self.duration = 0.0
+        self.timestamp = monotonic()
+
+    def position(self):
+        '''Return the elapsed and total time of the current song, in seconds'''
+        elapsed = self.elapsed
+        if self.state == "play":
+            elapsed += monotonic() - self.timestamp
+        if self.duration:
+            elapsed = min(elapsed, self.duration)
+        return elapsed, self.duration
+
+
+class StatusWatcher(QThread):
+    '''Push MPD status changes to the UI using MPD's idle command'''
+    statusChanged = Signal(dict)
+    # The new song, and the status it came with
+    songChanged = Signal(dict, dict)
+    mixerChanged = Signal(int)
+    optionsChanged = Signal(dict)
+    playlistChanged = Signal(dict)
+    databaseChanged = Signal()
+    connectionChanged = Signal(bool)
+
+    # Subsystems pyamp cares about
+    SUBSYSTEMS = ("player", "mixer", "options", "playlist", "database")
+
+    def __init__(self, connection):
+        super().__init__()
+        # The idle connection is never shared, it blocks until MPD has something to say
+        self.connection = connection
+        self.client = None
+        # Set before the thread starts so an early stop() is never lost
+        self.running = True
+        self.status = {}
+        self.song = None
+
+    def run(self):
+        '''Wait for MPD events and emit the matching signals, reconnecting when the connection drops'''
+        reconnecting = False
+        while self.running:
+            try:
+                self.client = self.connection.connect()
+                self.connectionChanged.emit(True)
+                # Anything may have changed while pyamp was disconnected
+                if reconnecting:
+                    self.databaseChanged.emit()
+                self.refresh(self.SUBSYSTEMS)
+                while self.running:
+                    changed = self.client.idle(*self.SUBSYSTEMS)
+                    # Only sent once an update of MPD's database has finished
+                    if "database" in changed:
+                        self.databaseChanged.emit()
+                    self.refresh(changed)
+            except CONNECTION_ERRORS as e:
+                self.connection.drop()
+                # Errors are expected when stop() pulls the socket from under idle
+                if self.running:
+                    print("Lost the connection to MPD: ", e)
+                    self.connectionChanged.emit(False)
+                    reconnecting = True
+        self.connection.drop()
+
+    def refresh(self, changed):
+        '''Fetch the status and current song in a single round-trip and emit what changed'''
+        self.client.command_list_ok_begin()
+        self.client.status()
+        self.client.currentsong()
+        status, song = self.client.command_list_end()
+        self.status = status
+        # Emit the song first so status listeners already see the new song
+        if song != self.song:
+            self.song = song
+            self.songChanged.emit(song, status)
+        self.statusChanged.emit(status)
+        if "mixer" in changed:
+            self.mixerChanged.emit(int(status.get("volume", -1)))
+        if "options" in changed:
+            self.optionsChanged.emit(status)
+        if "playlist" in changed:
+            self.playlistChanged.emit(status)
+
+    def stop(self):
+        '''Interrupt the pending idle command and wait for the thread to finish'''
+        self.running = False
+        self.connection.close()
+        self.wait()
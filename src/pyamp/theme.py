@@ -14,47 +14,30 @@
 #    You should have received a copy of the GNU General Public License
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import os
-from pyamp.config import ConfigManager
-# Unfortunately themes still need to be hardcoded
-from resources.themes.main.images import(
-    MAIN_BACKGROUND,
-    MAIN_SONG_PICKER_BACKGROUND,
-    MAIN_OPTIONS_BACKGROUND,
-    MAIN_NEXT,
-    MAIN_PREV,
-    MAIN_TOGGLE,
-    MAIN_ALBUM,
-    MAIN_STOP,
-    MAIN_ADD
-)
-from resources.themes.mpipe.images import(
-    MPIPE_BACKGROUND,
-    MPIPE_SONG_PICKER_BACKGROUND,
-    MPIPE_OPTIONS_BACKGROUND,
-    MPIPE_NEXT,
-    MPIPE_PREV,
-    MPIPE_TOGGLE,
-    MPIPE_ALBUM,
-    MPIPE_STOP,
-    MPIPE_ADD
-)
-from resources.themes.metal.images import(
-    METAL_BACKGROUND,
-    METAL_SONG_PICKER_BACKGROUND,
-    METAL_OPTIONS_BACKGROUND,
-    METAL_NEXT,
-    METAL_PREV,
-    METAL_TOGGLE,
-    METAL_ALBUM,
-    METAL_STOP,
-    METAL_ADD
-)
+import importlib
+import importlib.util
+from time import perf_counter
+from pyamp.config import get_config
+
+# Theme name: (folder inside resources/themes, prefix of its images)
+THEMES = {
+    "main": ("main", "MAIN"),
+    "midnight_pipe": ("mpipe", "MPIPE"),
+    "metal": ("metal", "METAL"),
+}
+
 
 class ThemeManager():
     '''Manage the themes for pyamp'''
     def __init__(self):
-        config_manager = ConfigManager()
-        self.theme = config_manager.get_value("theme")
+        self.theme = get_config().theme
+        # Unknown themes fall back to the main one
+        if self.theme not in THEMES:
+            self.theme = "main"
+        self.folder, self.prefix = THEMES[self.theme]
+        # Imported on first use, along with the time it took in seconds
+        self.images = None
+        self.load_time = 0.0
 
     def read_css(self, relative_path):
         '''Placeholder'''
@@ -70,76 +53,47 @@ class ThemeManager():
 
         return css_content
 
-    def get_theme(self):
-        '''Returns the stylesheet and images uri for the given theme'''
-        if self.theme == "main":
-            stylesheet = self.read_css('../resources/themes/main/styles.css')
-            tbar_stylesheet = self.read_css('../resources/themes/main/title_bar.css')
-            spicker_stylesheet = self.read_css('../resources/themes/main/song_picker.css')
-            options_stylesheet = self.read_css('../resources/themes/main/options.css')
-            sp_background = MAIN_SONG_PICKER_BACKGROUND
-            background = MAIN_BACKGROUND
-            op_background = MAIN_OPTIONS_BACKGROUND
-            next_img = MAIN_NEXT
-            prev_img = MAIN_PREV
-            toggle_img =MAIN_TOGGLE
-            album_img = MAIN_ALBUM
-            stop_img = MAIN_STOP
-            add_img = MAIN_ADD
-        elif self.theme == "midnight_pipe":
-            stylesheet = self.read_css('../resources/themes/mpipe/styles.css')
-            tbar_stylesheet = self.read_css('../resources/themes/mpipe/title_bar.css')
-            spicker_stylesheet = self.read_css('../resources/themes/mpipe/song_picker.css')
-            options_stylesheet = self.read_css('../resources/themes/mpipe/options.css')
-            sp_background = MPIPE_SONG_PICKER_BACKGROUND
-            op_background = MPIPE_OPTIONS_BACKGROUND
-            background = MPIPE_BACKGROUND
-            next_img = MPIPE_NEXT
-            prev_img = MPIPE_PREV
-            toggle_img = MPIPE_TOGGLE
-            album_img = MPIPE_ALBUM
-            stop_img = MPIPE_STOP
-            add_img = MPIPE_ADD
-        elif self.theme == "metal":
-            stylesheet = self.read_css('../resources/themes/metal/styles.css')
-            tbar_stylesheet = self.read_css('../resources/themes/metal/title_bar.css')
-            spicker_stylesheet = self.read_css('../resources/themes/metal/song_picker.css')
-            options_stylesheet = self.read_css('../resources/themes/metal/options.css')
-            sp_background = METAL_SONG_PICKER_BACKGROUND
-            op_background = METAL_OPTIONS_BACKGROUND
-            background = METAL_BACKGROUND
-            next_img = METAL_NEXT
-            prev_img = METAL_PREV
-            toggle_img = METAL_TOGGLE
-            album_img = METAL_ALBUM
-            stop_img = METAL_STOP
-            add_img = METAL_ADD
-        else:
-            stylesheet = self.read_css('../resources/themes/main/styles.css')
-            tbar_stylesheet = self.read_css('../resources/themes/main/title_bar.css')
-            spicker_stylesheet = self.read_css('../resources/themes/main/song_picker.css')
-            options_stylesheet = self.read_css('../resources/themes/main/options.css')
-            sp_background = MAIN_SONG_PICKER_BACKGROUND
-            op_background = MAIN_OPTIONS_BACKGROUND
-            background = MAIN_BACKGROUND
-            next_img = MAIN_NEXT
-            prev_img = MAIN_PREV
-            toggle_img =MAIN_TOGGLE
-            album_img = MAIN_ALBUM
-            stop_img = MAIN_STOP
-            add_img = MAIN_ADD
+    def load_images(self):
+        '''Import the images module of the selected theme only'''
+        if self.images is None:
+            start = perf_counter()
+            self.images = importlib.import_module(f"resources.themes.{self.folder}.images")
+            self.load_time = perf_counter() - start
+        return self.images
+
+    def images_stamp(self):
+        '''Return the mtime and size of the theme's images module without importing it'''
+        stat = os.stat(importlib.util.find_spec(f"resources.themes.{self.folder}.images").origin)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get_image(self, name):
+        '''Return the base64 data of the given image, e.g. "background" or "next"'''
+        return getattr(self.load_images(), f"{self.prefix}_{name.upper()}")
+
+    def get_stylesheets(self):
+        '''Returns the stylesheets for the given theme'''
+        css_path = f"../resources/themes/{self.folder}/"
         return(
-            sp_background,
-            background,
-            op_background,
-            next_img,
-            prev_img,
-            toggle_img,
-            album_img,
-            stop_img,
-            add_img,
-            stylesheet,
-            spicker_stylesheet,
-            tbar_stylesheet,
-            options_stylesheet,
+            self.read_css(css_path + "styles.css"),
+            self.read_css(css_path + "song_picker.css"),
+            self.read_css(css_path + "title_bar.css"),
+            self.read_css(css_path + "options.css"),
             )
+
+
+def main():
+    '''Report the startup time saved by only importing the selected theme'''
+    theme_manager = ThemeManager()
+    theme_manager.load_images()
+    print(f"Theme '{theme_manager.theme}' loaded in {theme_manager.load_time * 1000:.1f}ms")
+    # Import the themes pyamp used to load eagerly on every startup
+    start = perf_counter()
+    for folder, _ in THEMES.values():
+        if folder != theme_manager.folder:
+            importlib.import_module(f"resources.themes.{folder}.images")
+    skipped = perf_counter() - start
+    print(f"Skipped themes would have taken another {skipped * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -47,21 +47,26 @@ class NonSelectableLineEdit(QLineEdit):
 
 class createTitleBar(QWidget): # pylint: disable=C0103
     '''Title bar'''
-    def __init__(self, parent, title, tbar_stylesheet, mpd_manager, img_op_background, options_stylesheet, button=True):
+    def __init__(self, parent, title, tbar_stylesheet, mpd_manager, options_background, options_stylesheet, button=True):
         super().__init__(parent)
         self.title = title
         self.button = button
         self.stylesheet = tbar_stylesheet
-        self.init_ui(mpd_manager, img_op_background, options_stylesheet)
+        # The options window is only built the first time it's opened
+        self.mpd_manager = mpd_manager
+        # Called for the background pixmap, so it's only decoded if the options are opened
+        self.options_background = options_background
+        self.options_stylesheet = options_stylesheet
+        self.options_window = None
+        self.init_ui()
 
-    def init_ui(self, mpd_manager, img_op_background, options_stylesheet):
+    def init_ui(self):
         '''Title bar and other needed elements'''
         title_bar_layout = QHBoxLayout(self)
         title_bar_layout.setContentsMargins(5, 4, 5, 0)
 
         # Close button (if enabled)
         if self.button:
-            self.options_window = OptionsWindow(mpd_manager, img_op_background, options_stylesheet)
             more_button = QPushButton("=")
             more_button.setStyleSheet(self.stylesheet)
             more_button.setFixedHeight(16)
@@ -91,4 +96,6 @@ class createTitleBar(QWidget): # pylint: disable=C0103
 
     def open_options(self):
         '''Open options window'''
+        if self.options_window is None:
+            self.options_window = OptionsWindow(self.mpd_manager, self.options_background(), self.options_stylesheet)
         self.options_window.show()
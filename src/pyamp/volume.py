@@ -0,0 +1,115 @@
+#    Pyamp - Minimal MPD client written in Python using Qt
+#    Copyright (C) 2025  Ignacio Gonsalves
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from PySide6.QtCore import QObject, QTimer
+from mpd import CommandError, FailureResponseCode
+
+
+class VolumeControl(QObject):
+    '''Send volume changes to MPD at a limited rate, only the latest one is sent'''
+    def __init__(self, mpd_manager, rate=10):
+        super().__init__()
+        self.mpd_manager = mpd_manager
+        # Absolute volume waiting to be sent, or None
+        self.target = None
+        # Relative change waiting to be sent, used when there's no absolute one
+        self.delta = 0
+        # Volume the last change should end up at
+        self.value = None
+        # A command is on its way, the next one waits for it
+        self.in_flight = False
+        # Set when MPD doesn't know the "volume" command
+        self.relative_supported = True
+        # At most rate commands a second
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.set_rate(rate)
+        self.timer.timeout.connect(self.send)
+
+    def set_rate(self, rate):
+        '''Send at most rate commands a second'''
+        self.timer.setInterval(max(1, round(1000 / max(1, rate))))
+
+    def set_volume(self, value):
+        '''Set the volume, replacing the changes not sent yet'''
+        self.target = self.value = value
+        self.delta = 0
+        self.schedule()
+
+    def change_volume(self, delta, value):
+        '''Change the volume by delta, value being the volume it should end up at'''
+        if self.target is not None or not self.relative_supported:
+            # Folded into the absolute volume waiting to be sent
+            self.set_volume(value)
+            return
+        self.delta += delta
+        self.value = value
+        self.schedule()
+
+    def busy(self):
+        '''Return whether changes are waiting or on their way, the mixer events are older than them'''
+        return self.in_flight or self.target is not None or self.delta != 0
+
+    def schedule(self):
+        '''Send now if nothing was sent recently, otherwise when the timer runs out'''
+        if not self.timer.isActive() and not self.in_flight:
+            self.send()
+
+    def flush(self):
+        '''Send the pending change without waiting for the timer, e.g. when the slider is released'''
+        if not self.in_flight:
+            self.timer.stop()
+            self.send()
+
+    def send(self):
+        '''Send the latest change'''
+        if self.in_flight:
+            return
+        if self.target is not None:
+            command, argument = "setvol", self.target
+        elif self.delta:
+            command, argument = "volume", self.delta
+        else:
+            return
+        self.target = None
+        self.delta = 0
+        self.in_flight = True
+        self.timer.start()
+        self.mpd_manager.submit(
+            command, argument,
+            callback=lambda _: self.sent(),
+            errback=lambda e: self.failed(command, argument, e)
+        )
+
+    def sent(self):
+        '''Send what changed while the last command was on its way, once the rate allows it'''
+        self.in_flight = False
+        if not self.timer.isActive():
+            self.send()
+
+    def failed(self, command, argument, error):
+        '''Report the error, falling back to absolute changes if MPD has no relative ones'''
+        self.in_flight = False
+        if command == "volume" and isinstance(error, CommandError) and error.errno == FailureResponseCode.UNKNOWN:
+            # Older MPD versions don't know the command
+            print("MPD doesn't support relative volume changes, setting the volume instead")
+            self.relative_supported = False
+            if self.target is None:
+                self.set_volume(self.value)
+                return
+        else:
+            print(f"An error occurred while setting the volume: {error}")
+        if not self.timer.isActive():
+            self.send()